@@ -16,7 +16,11 @@ cp /media/cdrom/.discinfo $ISOLINUXDIR/
 #cp -r ../kickstarts/* $ISOLINUXDIR/ks
 # Copy menu system to disk
 mkdir -p $ISOLINUXDIR/EXTRAS/kickstart-menu
-cp -r ../kickstart-menu/{classes.py,jinja2,kickstart.py,kickstarts,markupsafe,menu.py,npyscreen} $ISOLINUXDIR/EXTRAS/kickstart-menu
+cp -r ../kickstart-menu/{classes.py,dependencies.py,hardware.py,hugepages.py,inventory.py,jinja2,kickstart.py,kickstarts,ksserver.py,layout.py,markupsafe,menu.py,nictuning.py,npyscreen,ranking.py,substitute.py,templatecache.py,topology.py,tuning.py,writer.py} $ISOLINUXDIR/EXTRAS/kickstart-menu
+# Compile the templates now so anaconda only loads precompiled modules or
+# cached bytecode instead of parsing them
+python $ISOLINUXDIR/EXTRAS/kickstart-menu/kickstart.py compile
+python $ISOLINUXDIR/EXTRAS/kickstart-menu/kickstart.py cache
 cp -r ../kickstart-menu/kickstarts/{main.ks,pre-menu.ks} $ISOLINUXDIR/ks
 
 cp -f ./isolinux.cfg $ISOLINUXDIR/isolinux
@@ -31,7 +31,11 @@ curl --create-dirs $BASEURL/EFI/BOOT/mmx64.efi -o $ISOLINUXDIR/EFI/BOOT/mmx64.ef
 curl --create-dirs $BASEURL/EFI/BOOT/fonts/unicode.pf2  -o $ISOLINUXDIR/EFI/BOOT/unicode.pf2
 
 mkdir -p $ISOLINUXDIR/EXTRAS/kickstart-menu
-cp -r ../kickstart-menu/{classes.py,jinja2,kickstart.py,kickstarts,markupsafe,menu.py,npyscreen} $ISOLINUXDIR/EXTRAS/kickstart-menu
+cp -r ../kickstart-menu/{classes.py,dependencies.py,hardware.py,hugepages.py,inventory.py,jinja2,kickstart.py,kickstarts,ksserver.py,layout.py,markupsafe,menu.py,nictuning.py,npyscreen,ranking.py,substitute.py,templatecache.py,topology.py,tuning.py,writer.py} $ISOLINUXDIR/EXTRAS/kickstart-menu
+# Compile the templates now so anaconda only loads precompiled modules or
+# cached bytecode instead of parsing them
+python $ISOLINUXDIR/EXTRAS/kickstart-menu/kickstart.py compile
+python $ISOLINUXDIR/EXTRAS/kickstart-menu/kickstart.py cache
 cp -r ../kickstart-menu/kickstarts/* $ISOLINUXDIR/ks
 cp -f ./isolinux.cfg $ISOLINUXDIR/isolinux
 #mount -o loop $ISOLINUXDIR/images/efiboot.img $ISOLINUXDIR/EFI
@@ -67,16 +67,17 @@ IP=$(ip addr show dev $interface | awk '$1 == "inet" { sub("/.*", "", $2); print
 #HOSTNAME=${TESTHOSTNAME[0]}
 #fi
 
-sed -i --follow-symlinks "s/<insert-token>/$token/g" /EDCOP/pxe/deploy/ks/minion/main.ks
-sed -i --follow-symlinks "s/<insert-master-ip>/$MASTERIP/g" /EDCOP/pxe/deploy/ks/minion/main.ks
-
-sed -i --follow-symlinks "s/<insert-fqdn>/$HOSTNAME/g" /etc/cockpit/cockpit.conf
-sed -i --follow-symlinks "s/<insert-fqdn>/$HOSTNAME/g" /EDCOP/kubernetes/platform-apps/cockpit.yaml
-sed -i --follow-symlinks "s/<insert-master-ip>/$MASTERIP/g" /EDCOP/kubernetes/platform-apps/cockpit.yaml
-sed -i --follow-symlinks "s/<insert-fqdn>/$HOSTNAME/g" /EDCOP/kubernetes/platform-apps/kubernetes-dashboard-http.yaml
-sed -i --follow-symlinks "s/<insert-fqdn>/$HOSTNAME/g" /EDCOP/kubernetes/ingress/traefik-ingress-controller.yaml
-sed -i --follow-symlinks "s/<insert-fqdn>/$HOSTNAME/g" /EDCOP/kubernetes/platform-apps/kubeapps.yaml
-sed -i --follow-symlinks "s/<insert-fqdn>/$HOSTNAME/g" /EDCOP/kubernetes/storage/rook-ingress.yaml
+# The minion kickstart server fills the token into rendered kickstarts
+printf '\nTOKEN=%s\n' "$token" >> /EDCOP/vars
+python /EDCOP/bin/substitute.py --vars /EDCOP/vars \
+  --define token=$token --map master-ip=MASTERIP --map fqdn=HOSTNAME \
+  /EDCOP/pxe/deploy/ks/minion/main.ks \
+  /etc/cockpit/cockpit.conf \
+  /EDCOP/kubernetes/platform-apps/cockpit.yaml \
+  /EDCOP/kubernetes/platform-apps/kubernetes-dashboard-http.yaml \
+  /EDCOP/kubernetes/ingress/traefik-ingress-controller.yaml \
+  /EDCOP/kubernetes/platform-apps/kubeapps.yaml \
+  /EDCOP/kubernetes/storage/rook-ingress.yaml
 #
 # Copy configuration file to root's home directory. Add to minion deployment
 # This ensures that "kubectl" commands can be run by root on all systems
@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+"""Benchmark kickstart generation.
+
+Renders the master and minion template sets for N synthetic nodes, the way
+kickstartGenerator() does for the menu, with each way of loading the
+templates:
+
+    cold      a new Environment per node, templates parsed from source
+    bytecode  a new Environment per node, bytecode from a filled cache
+    compiled  a new Environment per node, precompiled template modules
+    warm      one Environment reused for every node
+
+Every mode runs in its own process so its peak RSS is its own. Per-node
+latency percentiles and peak RSS are written to a JSON file:
+
+    python benchmark.py -n 200 -o benchmark.json
+"""
+from __future__ import print_function
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import timeit
+from jinja2 import Environment, FileSystemLoader
+import inventory
+import kickstart
+
+MODES = ('cold', 'bytecode', 'compiled', 'warm')
+
+
+def synthetic_node(index):
+    """Return a node with the attributes of a filled in menu.menuSystem."""
+    record = {
+        'hostname': 'bench-%04d' % index,
+        'interfaces': 'eno1,eno2,eno3,eno4',
+        'pxe_interface': 'eno1',
+        'pxe_ip': '10.50.50.1',
+        'pxe_netmask': '255.255.255.0',
+        'dhcp_start': '10.50.50.100',
+        'dhcp_end': '10.50.50.250',
+        'cluster_interfaces': 'eno2,eno3',
+        'os_disk': 'sda',
+        'fast_disk': 'nvme0n1',
+        'bulk_disk': 'sdb',
+        'shared_disk': 'sdc',
+    }
+    # Half the nodes take the static network branches of the templates
+    if index % 2:
+        record.update({
+            'cluster_bootproto': 'static',
+            'cluster_ip': '10.1.%d.%d' % (index // 250 % 250,
+                                          10 + index % 250),
+            'cluster_netmask': '255.255.255.0',
+            'gateway': '10.0.0.1',
+            'dns1': '8.8.8.8',
+            'dns2': '8.8.4.4',
+        })
+    return inventory.Node(record)
+
+
+def percentile(samples, percent):
+    """Return the nearest-rank percentile of sorted samples."""
+    if not samples:
+        return None
+    rank = int(math.ceil(percent / 100.0 * len(samples)))
+    return samples[max(rank, 1) - 1]
+
+
+def peak_rss():
+    """Return the peak resident set size of this process in KiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    if sys.platform == 'darwin':
+        peak //= 1024
+    return peak
+
+
+def _environments(mode, scratch):
+    """Return a function returning the Environment to render a node with."""
+    if mode == 'cold':
+        return lambda: Environment(
+            loader=FileSystemLoader(kickstart.KICKSTART_TEMPLATE_DIRECTORY),
+            keep_trailing_newline=True)
+    if mode == 'bytecode':
+        directory = os.path.join(scratch, 'bytecode')
+        kickstart.precompileTemplates(directory)
+        return lambda: kickstart.templateEnvironment(
+            bytecodeDirectory=directory, compiledDirectory=None)
+    if mode == 'compiled':
+        directory = os.path.join(scratch, 'compiled')
+        kickstart.compileTemplates(directory)
+        # No bytecode is cached for templates loaded from modules
+        empty = os.path.join(scratch, 'empty')
+        return lambda: kickstart.templateEnvironment(
+            bytecodeDirectory=empty, compiledDirectory=directory)
+    environment = Environment(
+        loader=FileSystemLoader(kickstart.KICKSTART_TEMPLATE_DIRECTORY),
+        keep_trailing_newline=True)
+    return lambda: environment
+
+
+def render_node(environment, node, directory, fsync):
+    """Render both template sets for a node like kickstartGenerator()."""
+    written = 0
+    for node_type in (kickstart.master, kickstart.minion):
+        scripts, subfolder, out_dir = node_type()
+        written += kickstart.renderKickstarts(
+            environment, scripts, subfolder,
+            os.path.join(directory, out_dir), fsync=fsync, data=node)
+    return written
+
+
+def run_mode(mode, nodes, scratch, fsync):
+    """Time every node in one mode and return its statistics."""
+    environments = _environments(mode, scratch)
+    output = os.path.join(scratch, 'output')
+    if mode == 'warm':
+        # Load every template once before timing
+        render_node(environments(), synthetic_node(0),
+                    os.path.join(output, 'warmup'), fsync)
+
+    samples = []
+    for index in range(nodes):
+        node = synthetic_node(index)
+        directory = os.path.join(output, node.host.name)
+        start = timeit.default_timer()
+        render_node(environments(), node, directory, fsync)
+        samples.append((timeit.default_timer() - start) * 1000.0)
+
+    ordered = sorted(samples)
+    return {
+        'samples': len(samples),
+        'total_s': round(sum(samples) / 1000.0, 4),
+        'mean_ms': round(sum(samples) / len(samples), 4),
+        'p50_ms': round(percentile(ordered, 50), 4),
+        'p99_ms': round(percentile(ordered, 99), 4),
+        'max_ms': round(ordered[-1], 4),
+        'peak_rss_kib': peak_rss(),
+    }
+
+
+def _child(mode, nodes, scratch, fsync, templates, results):
+    """Run one mode in a fresh process and send back its statistics."""
+    if templates is not None:
+        kickstart.KICKSTART_TEMPLATE_DIRECTORY = templates
+    try:
+        results.put((mode, run_mode(mode, nodes, scratch, fsync)))
+    except Exception as error:  # pylint: disable=broad-except
+        results.put((mode, {'error': repr(error)}))
+
+
+def benchmark(nodes, modes=MODES, fsync=False, templates=None,
+              directory=None):
+    """Run the modes one process at a time and return the results."""
+    scratch = tempfile.mkdtemp(prefix='ks-benchmark-', dir=directory)
+    results = multiprocessing.Queue()
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'nodes': nodes,
+        'fsync': fsync,
+        'templates': templates or kickstart.KICKSTART_TEMPLATE_DIRECTORY,
+        'modes': {},
+    }
+    try:
+        for mode in modes:
+            child = multiprocessing.Process(
+                target=_child,
+                args=(mode, nodes, os.path.join(scratch, mode), fsync,
+                      templates, results))
+            child.start()
+            name, statistics = results.get()
+            child.join()
+            report['modes'][name] = statistics
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return report
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(
+        description='Benchmark master and minion kickstart generation.')
+    parser.add_argument('-n', '--nodes', type=int, default=100,
+                        help='synthetic nodes per mode (default: %(default)s)')
+    parser.add_argument('-m', '--mode', action='append', choices=MODES,
+                        help='mode to run, may be repeated (default: all)')
+    parser.add_argument('-o', '--output', default='benchmark.json',
+                        help='JSON results file (default: %(default)s)')
+    parser.add_argument('--templates', default=None,
+                        help='template directory to benchmark instead of '
+                             'kickstarts/')
+    parser.add_argument('--directory', default=None,
+                        help='where to write the rendered files '
+                             '(default: the system temporary directory)')
+    parser.add_argument('--fsync', action='store_true',
+                        help='fsync the output like an installation does')
+    args = parser.parse_args(argv)
+
+    report = benchmark(args.nodes, args.mode or MODES, args.fsync,
+                       args.templates, args.directory)
+    with open(args.output, 'w') as output:
+        json.dump(report, output, indent=2, sort_keys=True)
+
+    print('%-9s %10s %10s %10s %12s' %
+          ('mode', 'p50 ms', 'p99 ms', 'total s', 'peak RSS KiB'))
+    for mode in args.mode or MODES:
+        statistics = report['modes'][mode]
+        if 'error' in statistics:
+            print('%-9s %s' % (mode, statistics['error']))
+            continue
+        print('%-9s %10.3f %10.3f %10.3f %12d' %
+              (mode, statistics['p50_ms'], statistics['p99_ms'],
+               statistics['total_s'], statistics['peak_rss_kib']))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,14 +2,31 @@
 """Desgined for interactive kickstart configuration."""
 from __future__ import print_function
 # import ipaddress
+import multiprocessing
 import os
 import random
-import parted
+import threading
+import time
+import hardware
+try:
+    import parted
+except ImportError:
+    # Only needed to probe local disks; inventory driven rendering works
+    # without it.
+    parted = None
 # pylint: disable=attribute-defined-outside-init
 
+# Disks probed at the same time and how long one may take
+PROBE_WORKERS = 8
+PROBE_TIMEOUT = 10.0
+# Hardware found by the menu, reused by later runs while nothing changed
+HARDWARE_SNAPSHOT = '/tmp/ks/hardware.json'
+
 
 def get_devices():
     """Code used by list-harddrives in anaconda."""
+    if parted is None:
+        return
     devices = parted.getAllDevices()
     devices = [d for d in devices if d.type != parted.DEVICE_DM and not
                d.path.startswith('/dev/sr')]
@@ -19,19 +36,216 @@ def get_devices():
         yield path, dev.getSize()
 
 
+def list_devices(sysfs_root=hardware.SYSFS_ROOT):
+    """Return the device paths to probe, or None if sysfs is missing."""
+    names = hardware.device_names(sysfs_root)
+    if names is None:
+        return None
+    return ['/dev/' + name for name in names]
+
+
+def probe_device(path):
+    """Return the name and size of one disk, or None to leave it out."""
+    device = parted.getDevice(path)
+    if device.type == parted.DEVICE_DM:
+        return None
+    return path[5:] if path.startswith('/dev/') else path, device.getSize()
+
+
+def _probe(path, connection):
+    """Probe a disk in a child process and send the result back."""
+    try:
+        connection.send(('ok', probe_device(path)))
+    except Exception as error:  # pylint: disable=broad-except
+        connection.send(('error', str(error) or type(error).__name__))
+    finally:
+        connection.close()
+
+
+class DiskDiscovery(object):
+    """Probe disks in parallel, without waiting on a sick one.
+
+    Every disk is probed in its own child process, at most ``workers`` at a
+    time. libparted can block in uninterruptible I/O, so a thread would not
+    do. A disk that fails, or does not answer within ``timeout`` seconds, is
+    recorded in ``slow`` and the others carry on. Discovery runs in a
+    background thread, and ``callback`` gets the disks found so far after
+    each one.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, paths, workers=PROBE_WORKERS, timeout=PROBE_TIMEOUT,
+                 callback=None):
+        """Init."""
+        self.paths = list(paths)
+        self.workers = workers
+        self.timeout = timeout
+        self.callback = callback
+        self.found = {}
+        self.slow = {}
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def pending(self):
+        """Return the number of disks not probed yet."""
+        with self.lock:
+            return len(self.paths) - len(self.found) - len(self.slow)
+
+    def harddrives(self):
+        """Return the hardware.Disk records of the disks found so far.
+
+        Slow disks are included with a size of None.
+        """
+        with self.lock:
+            disks = [hardware.Disk(name, size)
+                     for name, size in self.found.items()]
+            disks.extend(hardware.Disk(name) for name in self.slow)
+        return sorted(disks)
+
+    def _finished(self, path, status, result):
+        """Record the result of one probe."""
+        name = path[5:] if path.startswith('/dev/') else path
+        with self.lock:
+            if status != 'ok':
+                self.slow[name] = result
+            elif result is None:
+                # Not a disk after all
+                self.paths.remove(path)
+            else:
+                self.found[result[0]] = result[1]
+        if self.callback is not None:
+            self.callback(self.harddrives())
+
+    def _run(self):
+        """Keep up to ``workers`` probes running until all are done."""
+        waiting = list(self.paths)
+        running = {}
+        while waiting or running:
+            while waiting and len(running) < self.workers:
+                path = waiting.pop(0)
+                receiver, sender = multiprocessing.Pipe(duplex=False)
+                process = multiprocessing.Process(target=_probe,
+                                                  args=(path, sender))
+                process.daemon = True
+                process.start()
+                sender.close()
+                running[path] = (process, receiver, time.time())
+
+            for path, (process, receiver, started) in list(running.items()):
+                if receiver.poll():
+                    try:
+                        status, result = receiver.recv()
+                    except EOFError:
+                        status, result = 'error', 'probe exited'
+                    process.join(1)
+                elif not process.is_alive():
+                    status, result = 'error', 'probe exited'
+                elif time.time() - started > self.timeout:
+                    # A process stuck in the kernel may outlive this, but
+                    # it no longer holds up anything
+                    process.terminate()
+                    status, result = 'timeout', 'no response after %ds' % \
+                        self.timeout
+                else:
+                    continue
+                receiver.close()
+                del running[path]
+                self._finished(path, status, result)
+
+            if running:
+                time.sleep(0.05)
+        self.done.set()
+
+
 class Host(object):
     """Host class."""
 
-    def __init__(self):
-        """Init."""
+    def __init__(self, name=None, interfaces=None, harddrives=None,
+                 listener=None):
+        """Init.
+
+        Interfaces and hard drives are probed from the local system unless
+        they are given, e.g. when the host is described by an inventory.
+        Hard drives are hardware.Disk records read from sysfs; libparted
+        is only used, by a background DiskDiscovery, for disks sysfs cannot
+        describe. ``listener`` gets the hard drives whenever the discovery
+        adds some, in the discovery's thread.
+        """
+        self.listener = listener
         self.interfaces = []
         self.harddrives = []
-        for name in os.listdir('/sys/class/net'):
-            if not name == 'lo':
-                self.interfaces.append(name)
-        for dev, size in sorted(set(get_devices())):
-            self.harddrives.append([dev, size])
-        self.name = 'master-' + str(random.randint(1, 65535))
+        self.discovery = None
+        self._sysfs_harddrives = []
+        self._snapshot = None
+        if interfaces is None:
+            for ifname in os.listdir('/sys/class/net'):
+                if not ifname == 'lo':
+                    self.interfaces.append(ifname)
+        else:
+            self.interfaces.extend(interfaces)
+        if harddrives is None:
+            scanned = hardware.scan_disks()
+            if scanned is None:
+                for dev, size in sorted(set(get_devices())):
+                    self.harddrives.append(hardware.Disk(dev, size))
+            else:
+                self._sysfs_harddrives, unreadable = scanned
+                self.harddrives = list(self._sysfs_harddrives)
+                if unreadable and parted is not None:
+                    self.discovery = DiskDiscovery(
+                        ['/dev/' + name for name in unreadable],
+                        callback=self._update_harddrives)
+        else:
+            self.harddrives.extend(harddrives)
+        if name is None:
+            name = 'master-' + str(random.randint(1, 65535))
+        self.name = name
+
+    @classmethod
+    def from_snapshot(cls, path=HARDWARE_SNAPSHOT, name=None,
+                      listener=None):
+        """Return the local Host, from the snapshot at path if the disks
+        and NICs did not change since it was saved.
+
+        Otherwise the hardware is probed and the snapshot replaced once
+        every disk answered.
+        """
+        snapshot = hardware.load_snapshot(path)
+        if snapshot is not None:
+            return cls(name=name, interfaces=snapshot['interfaces'],
+                       harddrives=snapshot['harddrives'], listener=listener)
+        identity = hardware.fingerprint()
+        host = cls(name=name, listener=listener)
+        host._snapshot = (path, identity)
+        host.save_snapshot()
+        return host
+
+    def save_snapshot(self):
+        """Save the hardware for Host.from_snapshot, unless a disk did not
+        answer.
+        """
+        if self._snapshot is None:
+            return
+        if self.discovery is not None and (self.discovery.slow or
+                                           self.discovery.pending()):
+            return
+        path, identity = self._snapshot
+        hardware.save_snapshot(path, self.interfaces, self.harddrives,
+                               identity)
+        self._snapshot = None
+
+    def _update_harddrives(self, harddrives):
+        """Add the disks found so far by the discovery."""
+        self.harddrives = sorted(self._sysfs_harddrives + harddrives)
+        # The discovery may call back before the constructor stored it;
+        # from_snapshot() saves in that case
+        if self.discovery is not None and not self.discovery.pending():
+            self.save_snapshot()
+        if self.listener is not None:
+            self.listener(self.harddrives)
 
     def pre_hostname(self):
         """Create /tmp/pre_hostname kickstart snipet."""
@@ -61,6 +275,7 @@ class Network(object):
         """Init."""
         self.ip_address = ip_address
         self.netmask = netmask
+        self.network = network
         self.bootproto = bootproto
         self.interface = interface
         self.enabled = enabled
@@ -113,6 +328,7 @@ class PXENetwork(Network):
         super(PXENetwork, self).__init__(enabled=True,
                                          ip_address=ip_address,
                                          netmask=netmask,
+                                         network=network,
                                          bootproto=bootproto,
                                          **kargs)
         self.dhcp_start = dhcp_start
@@ -145,6 +361,7 @@ class ClusterNetwork(Network):
         super(ClusterNetwork, self).__init__(enabled=True,
                                              ip_address=ip_address,
                                              netmask=netmask,
+                                             network=network,
                                              bootproto=bootproto,
                                              **kargs)
         self.dns1 = dns1
@@ -181,12 +398,19 @@ class ClusterNetwork(Network):
 
 
 class Storage(object):
-    """Storage class used to setup disk requirements."""
+    """Storage class used to setup disk requirements.
+
+    A role can take several disks, which are striped together (RAID 0)
+    with stripe_size KiB chunks; stripe_size None keeps the md default.
+    """
 
-    def __init__(self, mountpoint=None, disk=None):
+    def __init__(self, mountpoint=None, disk=None, disks=None,
+                 stripe_size=None):
         """Init."""
         self.mountpoint = mountpoint
-        self.disk = disk
+        self.disks = disks if disks is not None else \
+            [] if disk is None else [disk]
+        self.stripe_size = stripe_size
 
     @property
     def mountpoint(self):
@@ -199,12 +423,37 @@ class Storage(object):
 
     @property
     def disk(self):
-        """Return host disk object."""
-        return self._disk
+        """Return the first host disk object, or None."""
+        return self._disks[0] if self._disks else None
 
     @disk.setter
     def disk(self, disk):
-        self._disk = disk
+        self._disks = [] if disk is None else [disk]
+
+    @property
+    def disks(self):
+        """Return the host disk objects striped together."""
+        return self._disks
+
+    @disks.setter
+    def disks(self, disks):
+        self._disks = list(disks)
+
+    @property
+    def stripe_size(self):
+        """Allow you to configure the stripe size in KiB."""
+        return self._stripe_size
+
+    @stripe_size.setter
+    def stripe_size(self, stripe_size):
+        self._stripe_size = stripe_size
+
+
+def network_id(ip_address, netmask):
+    """Return the network ID for an IP address and netmask."""
+    octets = [int(ip) & int(mask) for ip, mask in
+              zip(ip_address.split('.'), netmask.split('.'))]
+    return '.'.join(str(octet) for octet in octets)
 
 
 def main():
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+"""Track which model attributes each kickstart template reads."""
+import hashlib
+import json
+import os
+from jinja2 import meta, nodes
+
+STATE_FILE = '.kickstart-state.json'
+_MISSING = object()
+# Dependencies by (template name, source checksum), shared by every
+# RenderState of the process so batch runs parse each template once
+_DEPENDENCIES = {}
+
+
+def find_dependencies(ast):
+    """Return the attribute paths a parsed template reads.
+
+    ``meta.find_undeclared_variables`` only knows the context variables
+    (``data``, ``node``); the Getattr/Getitem chains below them are followed
+    so that e.g. ``data.network_cluster.interface[0]`` becomes
+    ``data.network_cluster.interface``. ``node is defined`` only depends on
+    whether ``node`` exists and is recorded as ``defined:node``.
+    """
+    roots = meta.find_undeclared_variables(ast)
+    paths = set()
+
+    def chain(node):
+        """Return the dotted path of a Getattr chain on a root, or None."""
+        if isinstance(node, nodes.Name):
+            return node.name if node.name in roots else None
+        if isinstance(node, nodes.Getattr):
+            base = chain(node.node)
+            return None if base is None else base + '.' + node.attr
+        return None
+
+    def visit(node):
+        """Record the outermost chains and keep looking below the rest."""
+        if isinstance(node, nodes.Test) and \
+                node.name in ('defined', 'undefined'):
+            path = chain(node.node)
+            if path is not None:
+                paths.add('defined:' + path)
+                return
+        if isinstance(node, (nodes.Name, nodes.Getattr)):
+            path = chain(node)
+            if path is not None:
+                paths.add(path)
+                return
+        if isinstance(node, nodes.Getitem):
+            # Items depend on the whole container
+            path = chain(node.node)
+            if path is not None:
+                paths.add(path)
+                visit(node.arg)
+                return
+        for child in node.iter_child_nodes():
+            visit(child)
+
+    visit(ast)
+    return sorted(paths)
+
+
+def resolve(context, path):
+    """Return the value of a dependency path in the render context."""
+    defined = path.startswith('defined:')
+    if defined:
+        path = path[len('defined:'):]
+    names = path.split('.')
+    value = context.get(names[0], _MISSING)
+    for name in names[1:]:
+        if value is _MISSING:
+            break
+        value = getattr(value, name, _MISSING)
+    if defined:
+        return value is not _MISSING
+    return None if value is _MISSING else value
+
+
+def _plain(value):
+    """Serialize model objects by their attributes."""
+    if hasattr(value, '__dict__'):
+        return vars(value)
+    return repr(value)
+
+
+def sha256(text):
+    """Return the hex SHA-256 digest of a text."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class RenderState(object):
+    """Inputs of the last render into one directory.
+
+    Stored next to the rendered files so a re-run can skip templates whose
+    inputs did not change.
+    """
+
+    def __init__(self, directory):
+        """Init."""
+        self.filename = os.path.join(directory, STATE_FILE)
+        self.changed = False
+        try:
+            with open(self.filename) as state:
+                self.state = json.load(state)
+        except (IOError, OSError, ValueError):
+            self.state = {'dependencies': {}, 'templates': {}}
+
+    def dependencies(self, environment, name, source):
+        """Return the dependency paths of a template, parsing it only once
+        per source version.
+        """
+        checksum = sha256(source)
+        cached = self.state['dependencies'].get(name)
+        if cached is None or cached['checksum'] != checksum:
+            paths = _DEPENDENCIES.get((name, checksum))
+            if paths is None:
+                paths = find_dependencies(environment.parse(source, name))
+                _DEPENDENCIES[(name, checksum)] = paths
+            cached = {'checksum': checksum, 'paths': paths}
+            self.state['dependencies'][name] = cached
+            self.changed = True
+        return cached['paths']
+
+    def inputs(self, environment, name, source, context):
+        """Return a fingerprint of the template source and every value it
+        reads from the context.
+        """
+        paths = self.dependencies(environment, name, source)
+        values = [(path, resolve(context, path)) for path in paths]
+        fingerprint = json.dumps([sha256(source), values], sort_keys=True,
+                                 default=_plain)
+        return sha256(fingerprint)
+
+    def unchanged(self, name, inputs):
+        """Return True if the last render used the same inputs.
+
+        Whether that render's output is still intact is up to the caller.
+        """
+        last = self.state['templates'].get(name)
+        return last is not None and last['inputs'] == inputs
+
+    def rendered(self, name, inputs):
+        """Record the inputs of a render."""
+        if self.state['templates'].get(name) != {'inputs': inputs}:
+            self.state['templates'][name] = {'inputs': inputs}
+            self.changed = True
+
+    def save(self, writer):
+        """Write the state file through a writer.OutputWriter if anything
+        changed.
+        """
+        if not self.changed:
+            return
+        with writer.open(STATE_FILE, checksum=False) as state:
+            state.write(json.dumps(self.state))
+        self.changed = False
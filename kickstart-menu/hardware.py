@@ -0,0 +1,341 @@
+#!/usr/bin/env python
+"""Hardware inventory read from sysfs.
+
+Everything here reads attribute files only, so it needs neither root nor
+libparted and never waits on a disk.  Every function takes the sysfs mount
+point so it can be pointed at a copied or hand-made tree.
+
+An inventory can be saved as a snapshot and reused for as long as the
+disks and NICs in sysfs are the same ones.
+"""
+import json
+import os
+import threading
+from collections import namedtuple
+import writer
+
+SYSFS_ROOT = '/sys'
+# Block devices that are never installation targets
+SKIPPED_DEVICES = ('dm-', 'loop', 'ram', 'sr', 'zram')
+# /sys/block/<name>/size is always in 512 byte sectors
+SECTOR_SIZE = 512
+MIB = 1024 * 1024
+SNAPSHOT_VERSION = 1
+
+
+class Disk(namedtuple('Disk', ('name', 'size', 'rotational', 'transport',
+                               'model', 'serial', 'numa_node',
+                               'removable'))):
+    """A whole disk.
+
+    ``disk[0]`` and ``disk[1]`` are the name and size in MiB, like the
+    [name, size] lists used before, so the templates and stored answers
+    keep working.  Attributes that could not be read are None.
+    """
+
+    __slots__ = ()
+
+    # pylint: disable=too-many-arguments
+    def __new__(cls, name, size=None, rotational=None, transport=None,
+                model=None, serial=None, numa_node=None, removable=False):
+        """Create a record, only the name is required."""
+        return super(Disk, cls).__new__(cls, name, size, rotational,
+                                        transport, model, serial, numa_node,
+                                        removable)
+
+    def __str__(self):
+        """Describe the disk on one line for the storage forms."""
+        parts = [self.name]
+        if self.size is None:
+            parts.append('(no response)')
+        else:
+            parts.append('%.1f GiB' % (self.size / 1024.0))
+        if self.rotational is not None:
+            parts.append('HDD' if self.rotational else 'SSD')
+        if self.transport:
+            parts.append(self.transport.upper())
+        if self.model:
+            parts.append(self.model)
+        if self.removable:
+            parts.append('removable')
+        return '  '.join(parts)
+
+
+class Nic(namedtuple('Nic', ('name', 'operstate', 'speed', 'duplex', 'driver',
+                             'mac', 'numa_node', 'sriov_totalvfs',
+                             'virtual_function'))):
+    """The state of one network interface.
+
+    ``speed`` is in Mb/s and None while the link is down; attributes that
+    could not be read are None.
+    """
+
+    __slots__ = ()
+
+
+def _read(path):
+    """Return the stripped text of a sysfs attribute, or None."""
+    try:
+        with open(path) as attribute:
+            return attribute.read().strip()
+    except (IOError, OSError):
+        return None
+
+
+def _read_int(path):
+    """Return a sysfs attribute as an integer, or None."""
+    value = _read(path)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _serial(device):
+    """Return the serial number below a block device's ``device`` link."""
+    serial = _read(os.path.join(device, 'serial'))
+    if serial:
+        return serial
+    # SCSI and SATA disks only expose the unit serial number VPD page:
+    # a four byte header followed by the serial
+    try:
+        with open(os.path.join(device, 'vpd_pg80'), 'rb') as page:
+            serial = page.read()[4:].strip(b'\0 \n')
+    except (IOError, OSError):
+        return None
+    if not isinstance(serial, str):
+        serial = serial.decode('ascii', 'replace')
+    return serial or None
+
+
+def _numa_node(path, sysfs_root):
+    """Return the NUMA node of the closest ancestor that has one."""
+    stop = os.path.realpath(os.path.join(sysfs_root, 'devices'))
+    while path.startswith(stop) and path != stop:
+        node = _read_int(os.path.join(path, 'numa_node'))
+        if node is not None:
+            # -1: no NUMA affinity
+            return node if node >= 0 else None
+        path = os.path.dirname(path)
+    return None
+
+
+def _transport(name, path):
+    """Guess how a disk is attached from its name and device path."""
+    if name.startswith('nvme'):
+        return 'nvme'
+    if name.startswith('md'):
+        return 'md'
+    for marker, transport in (('/usb', 'usb'), ('/virtio', 'virtio'),
+                              ('/ata', 'sata'), ('/host', 'scsi')):
+        if marker in path:
+            return transport
+    return None
+
+
+def read_nic(name, sysfs_root=SYSFS_ROOT):
+    """Return the Nic for one /sys/class/net entry."""
+    net = os.path.join(sysfs_root, 'class', 'net', name)
+    device = os.path.join(net, 'device')
+    speed = _read_int(os.path.join(net, 'speed'))
+    driver = os.path.join(device, 'driver')
+    numa_node = _read_int(os.path.join(device, 'numa_node'))
+    return Nic(name=name,
+               operstate=_read(os.path.join(net, 'operstate')) or 'unknown',
+               # -1 or unreadable while the link is down
+               speed=speed if speed is not None and speed > 0 else None,
+               duplex=_read(os.path.join(net, 'duplex')),
+               driver=os.path.basename(os.path.realpath(driver))
+               if os.path.exists(driver) else None,
+               mac=_read(os.path.join(net, 'address')),
+               numa_node=numa_node if numa_node is not None and
+               numa_node >= 0 else None,
+               sriov_totalvfs=_read_int(os.path.join(device,
+                                                     'sriov_totalvfs')),
+               virtual_function=os.path.exists(os.path.join(device,
+                                                            'physfn')))
+
+
+def scan_nics(names=None, sysfs_root=SYSFS_ROOT):
+    """Return a Nic for each interface name, all of them but lo if None.
+
+    Return: dict of name to Nic; interfaces that disappeared are left out
+    """
+    if names is None:
+        try:
+            names = [name for name in
+                     os.listdir(os.path.join(sysfs_root, 'class', 'net'))
+                     if name != 'lo']
+        except OSError:
+            return {}
+    nics = {}
+    for name in names:
+        if os.path.isdir(os.path.join(sysfs_root, 'class', 'net', name)):
+            nics[name] = read_nic(name, sysfs_root)
+    return nics
+
+
+class NicMonitor(object):
+    """Keep the state of some interfaces up to date in the background.
+
+    ``nics`` is replaced as a whole after every scan that changed
+    something, and ``version`` is incremented, so a form only needs to
+    compare versions to know when to redraw. ``callback`` gets the new
+    ``nics`` too, in the monitor's thread.
+    """
+
+    def __init__(self, names, interval=2.0, sysfs_root=SYSFS_ROOT,
+                 callback=None):
+        """Init, scanning once before returning."""
+        self.names = list(names)
+        self.interval = interval
+        self.sysfs_root = sysfs_root
+        self.callback = callback
+        self.nics = scan_nics(self.names, sysfs_root)
+        self.version = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _run(self):
+        """Rescan until stopped."""
+        while not self.stopped.wait(self.interval):
+            nics = scan_nics(self.names, self.sysfs_root)
+            if nics != self.nics:
+                self.nics = nics
+                self.version += 1
+                if self.callback is not None:
+                    self.callback(nics)
+
+    def stop(self):
+        """Stop refreshing."""
+        self.stopped.set()
+
+
+def device_names(sysfs_root=SYSFS_ROOT):
+    """Return the names of the whole disks, or None without sysfs."""
+    try:
+        names = os.listdir(os.path.join(sysfs_root, 'block'))
+    except OSError:
+        return None
+    return sorted(name for name in names
+                  if not name.startswith(SKIPPED_DEVICES))
+
+
+def read_disk(name, sysfs_root=SYSFS_ROOT):
+    """Return the Disk for one /sys/block entry.
+
+    Raise IOError if the disk's size cannot be read.
+    """
+    block = os.path.join(sysfs_root, 'block', name)
+    sectors = _read_int(os.path.join(block, 'size'))
+    if sectors is None:
+        raise IOError('Cannot read the size of ' + name)
+    device = os.path.join(block, 'device')
+    model = _read(os.path.join(device, 'model'))
+    vendor = _read(os.path.join(device, 'vendor'))
+    if vendor and model and not model.startswith(vendor) and \
+            vendor != 'ATA':
+        model = vendor + ' ' + model
+    rotational = _read_int(os.path.join(block, 'queue', 'rotational'))
+    path = os.path.realpath(block)
+    return Disk(name=name,
+                size=sectors * SECTOR_SIZE / float(MIB),
+                rotational=None if rotational is None else bool(rotational),
+                transport=_transport(name, path),
+                model=model or None,
+                serial=_serial(device),
+                numa_node=_numa_node(path, sysfs_root),
+                removable=_read(os.path.join(block, 'removable')) == '1')
+
+
+def scan_disks(sysfs_root=SYSFS_ROOT):
+    """Read every disk in one pass.
+
+    Return: (disks, unreadable) with the Disk records, without empty
+    devices such as card readers, and the names whose attributes could not
+    be read; None without sysfs
+    """
+    names = device_names(sysfs_root)
+    if names is None:
+        return None
+    disks = []
+    unreadable = []
+    for name in names:
+        try:
+            disk = read_disk(name, sysfs_root)
+        except (IOError, OSError):
+            unreadable.append(name)
+            continue
+        if disk.size:
+            disks.append(disk)
+    return disks, unreadable
+
+
+def fingerprint(sysfs_root=SYSFS_ROOT):
+    """Return a cheap identity of the disks and NICs present.
+
+    Only the /sys/block and /sys/class/net entries are looked at: a device
+    that is added, removed or re-created changes the list or the inode and
+    mtime of its entry.
+    """
+    entries = []
+    for directory in ('block', os.path.join('class', 'net')):
+        path = os.path.join(sysfs_root, directory)
+        try:
+            names = sorted(os.listdir(path))
+        except OSError:
+            entries.append([directory, None])
+            continue
+        for name in names:
+            try:
+                stat = os.lstat(os.path.join(path, name))
+            except OSError:
+                continue
+            entries.append([directory, name, stat.st_ino, stat.st_mtime])
+    return entries
+
+
+def load_snapshot(path, sysfs_root=SYSFS_ROOT):
+    """Return the saved inventory if the hardware is unchanged, else None.
+
+    Return: dict with the ``interfaces`` names and ``harddrives`` Disks
+    """
+    try:
+        with open(path) as snapshot_file:
+            snapshot = json.load(snapshot_file)
+    except (IOError, OSError, ValueError):
+        return None
+    if not isinstance(snapshot, dict) or \
+            snapshot.get('version') != SNAPSHOT_VERSION or \
+            snapshot.get('fingerprint') != fingerprint(sysfs_root):
+        return None
+    try:
+        return {'interfaces': list(snapshot['interfaces']),
+                'harddrives': [Disk(*disk)
+                               for disk in snapshot['harddrives']]}
+    except (KeyError, TypeError):
+        return None
+
+
+def save_snapshot(path, interfaces, harddrives, identity):
+    """Save an inventory with the fingerprint() taken before probing it.
+
+    Return: False if the snapshot could not be written
+    """
+    snapshot = {'version': SNAPSHOT_VERSION,
+                'fingerprint': identity,
+                'interfaces': list(interfaces),
+                'harddrives': [list(disk) for disk in harddrives]}
+    directory, name = os.path.split(os.path.abspath(path))
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        output = writer.OutputWriter(directory, fsync=False)
+        with output.open(name, checksum=False) as snapshot_file:
+            snapshot_file.write(json.dumps(snapshot))
+        output.commit()
+    except (IOError, OSError):
+        return False
+    return True
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""Size the hugepages of a node from its memory per NUMA node and sensors.
+
+Every node keeps a little hugepage memory for Open vSwitch with DPDK on
+each NUMA node. Minions give a quarter of the memory of the NUMA nodes of
+their sensor NICs to the sensors' DPDK workloads. No node ever gives more
+than half of a NUMA node's memory. 1G pages are used when the CPU supports
+them, one NUMA node gets at least 4G and every NUMA node at least 1G.
+"""
+from collections import namedtuple
+
+# Page sizes in MiB, by their kernel argument name
+PAGE_SIZES = {'2M': 2, '1G': 1024}
+# Open vSwitch DPDK memory per NUMA node, in MiB
+BASE_MEMORY = 1024
+# Shares of a NUMA node's memory: at most for the base memory (small VMs),
+# by default for the sensors and at most for hugepages in total
+BASE_SHARE = 1.0 / 8
+SENSOR_SHARE = 1.0 / 4
+MAX_SHARE = 1.0 / 2
+# The largest amount per NUMA node that makes 1G pages worth it, in MiB
+GIGANTIC_MINIMUM = 4096
+
+
+class HugepagePlan(namedtuple('HugepagePlan', ('size', 'pages'))):
+    """Page size name and number of pages by NUMA node."""
+
+    __slots__ = ()
+
+    @property
+    def balanced(self):
+        """Return True if every NUMA node gets the same number of pages."""
+        return len(set(self.pages.values())) <= 1
+
+    def boot_pages(self):
+        """Return the number of pages to reserve on the kernel command line.
+
+        The kernel spreads them evenly over the NUMA nodes, so an uneven
+        plan reserves the largest count on every node and node_pages()
+        gives the extra pages back once booted.
+        """
+        if self.balanced:
+            return sum(self.pages.values())
+        return max(self.pages.values()) * len(self.pages)
+
+    def kernel_args(self):
+        """Return the kernel arguments reserving the pages."""
+        return ['default_hugepagesz=' + self.size,
+                'hugepagesz=' + self.size,
+                'hugepages=%d' % self.boot_pages()]
+
+    def node_pages(self):
+        """Return the sysfs page count file and count of every NUMA node.
+
+        Return: empty list if the boot reservation is already right
+        """
+        if self.balanced:
+            return []
+        directory = 'hugepages-%dkB' % (PAGE_SIZES[self.size] * 1024)
+        return [('/sys/devices/system/node/node%d/hugepages/%s/nr_hugepages'
+                 % (node, directory), count)
+                for node, count in sorted(self.pages.items())]
+
+
+def plan_hugepages(memory, sensor_nodes=(), sensor_memory=None,
+                   gigantic=False):
+    """Return the HugepagePlan of a node, or None without its memory.
+
+    memory: dict of NUMA node to its memory in MiB
+    sensor_nodes: NUMA nodes of the sensor NICs
+    sensor_memory: DPDK memory per sensor NUMA node in MiB, by default
+        SENSOR_SHARE of the node's memory
+    gigantic: True if the CPU supports 1G pages
+    """
+    if not memory:
+        return None
+    wanted = {}
+    for node, total in memory.items():
+        amount = min(BASE_MEMORY, total * BASE_SHARE)
+        if node in sensor_nodes:
+            amount = max(amount, sensor_memory if sensor_memory is not None
+                         else total * SENSOR_SHARE)
+        wanted[node] = min(amount, total * MAX_SHARE)
+
+    size = '2M'
+    amounts = [amount for amount in wanted.values() if amount]
+    if gigantic and amounts and max(amounts) >= GIGANTIC_MINIMUM and \
+            min(amounts) >= PAGE_SIZES['1G']:
+        size = '1G'
+    return HugepagePlan(size, dict(
+        (node, int(amount // PAGE_SIZES[size]))
+        for node, amount in wanted.items()))
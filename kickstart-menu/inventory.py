@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+"""Node inventories used to render kickstarts without the menu."""
+from __future__ import print_function
+import csv
+import json
+import os
+import classes
+import hardware
+import layout
+import tuning
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+
+class Node(object):
+    """Describe one node with the same attributes as the menu system.
+
+    The kickstart templates only read ``data.host``, ``data.network_*`` and
+    ``data.storage_*``, so a node can be rendered exactly like the object
+    built interactively by ``menu.menuSystem``.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, record):
+        """Init from a flat inventory record."""
+        self.role = record.get('role') or 'minion'
+        # Lower case so they compare equal to the MACs anaconda sends
+        self.macs = [mac.lower() for mac in _split(record.get('mac'))]
+        # Only addresses given in the record, the others are menu defaults
+        # shared by every node
+        self.addresses = [record[field] for field in ('pxe_ip', 'cluster_ip')
+                          if record.get(field) not in (None, '')]
+        self.host = classes.Host(name=record.get('hostname') or '',
+                                 interfaces=_split(record.get('interfaces')),
+                                 harddrives=[])
+        self.network_pxe = classes.PXENetwork(
+            interface=record.get('pxe_interface'),
+            **_present(record, ip_address='pxe_ip',
+                       netmask='pxe_netmask',
+                       dhcp_start='dhcp_start',
+                       dhcp_end='dhcp_end',
+                       bootproto='pxe_bootproto'))
+        self.network_pxe.network = classes.network_id(
+            self.network_pxe.ip_address, self.network_pxe.netmask)
+        self.network_cluster = classes.ClusterNetwork(
+            interface=_split(record.get('cluster_interfaces')) or None,
+            **_present(record, ip_address='cluster_ip',
+                       netmask='cluster_netmask',
+                       gateway='gateway',
+                       dns1='dns1',
+                       dns2='dns2',
+                       bootproto='cluster_bootproto',
+                       teaming='teaming'))
+        self.network_cluster.network = classes.network_id(
+            self.network_cluster.ip_address, self.network_cluster.netmask)
+        self.network_trust = classes.Network()
+        self.network_untrust = classes.Network()
+        self.network_passive = classes.Network()
+        self.storage_os = classes.Storage(
+            mountpoint="/", disk=_disk(record.get('os_disk')))
+        self.storage_fast = classes.Storage(
+            mountpoint="/var/EDCOP/fast",
+            disks=_disks(record.get('fast_disk')),
+            stripe_size=_integer(record.get('fast_stripe_size')))
+        self.storage_bulk = classes.Storage(
+            mountpoint="/var/EDCOP/bulk",
+            disks=_disks(record.get('bulk_disk')),
+            stripe_size=_integer(record.get('bulk_stripe_size')))
+        self.storage_shared = classes.Storage(
+            mountpoint="/var/EDCOP/shared",
+            disks=_disks(record.get('shared_disk')),
+            stripe_size=_integer(record.get('shared_stripe_size')))
+        for storage in (self.storage_os, self.storage_fast,
+                        self.storage_bulk, self.storage_shared):
+            for disk in storage.disks:
+                if disk not in self.host.harddrives:
+                    self.host.harddrives.append(disk)
+        self._storage_layout = None
+        self.tuning = tuning.Tuning.plan(
+            _topology(record.get('topology')),
+            _split(record.get('sensor_interfaces')), self.role,
+            _integer(record.get('sensor_memory')))
+
+    @property
+    def storage_layout(self):
+        """Return the layout.Layout of the node's disks.
+
+        Planned on first use, the disks of a node do not change; invalid
+        disks raise ValueError every time.
+        """
+        if self._storage_layout is None:
+            self._storage_layout = layout.plan_storage(self, self.role)
+        return self._storage_layout
+
+    def errors(self):
+        """Return a 'field: problem' line for every invalid field."""
+        # The per-node templates have no fallback for these
+        errors = ['%s: missing' % field for field, value in (
+            ('pxe_interface', self.network_pxe.interface),
+            ('cluster_interfaces', self.network_cluster.interface),
+            ('os_disk', self.storage_os.disk)) if not value]
+        return errors + storage_errors(self)
+
+
+def storage_errors(data):
+    """Return a 'field: problem' line for every storage setting of a node
+    or menu system that cannot be laid out, by inventory field name.
+    """
+    errors = []
+    for data_role in ('fast', 'bulk', 'shared'):
+        try:
+            layout.check_stripe_size(
+                getattr(data, 'storage_' + data_role).stripe_size)
+        except ValueError as error:
+            errors.append('%s_stripe_size: %s' % (data_role, error))
+    if errors:
+        return errors
+    try:
+        data.storage_layout
+    except layout.DiskSetError as error:
+        errors.append('%s: %s' % (', '.join(data_role + '_disk'
+                                            for data_role in error.roles),
+                                  error))
+    return errors
+
+
+def _split(value):
+    """Return a list from a list or a comma separated string."""
+    if value is None or value == '':
+        return []
+    if isinstance(value, list):
+        return value
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def _present(record, **fields):
+    """Map record fields to keyword arguments, skipping empty cells."""
+    return dict((argument, record[field])
+                for argument, field in fields.items()
+                if record.get(field) not in (None, ''))
+
+
+def _disk(value):
+    """Return a hardware.Disk for a disk name or a [name, size] list."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, list):
+        return hardware.Disk(*value)
+    return hardware.Disk(value)
+
+
+def _disks(value):
+    """Return the hardware.Disk list of one or more disks.
+
+    A disk is a name or a [name, size] list; several disks are a list of
+    them, or comma separated names in a CSV cell.
+    """
+    if value is None or value == '':
+        return []
+    if isinstance(value, list):
+        # [name, size] has a size (or null) after the name
+        if any(item is None or isinstance(item, (int, float))
+               for item in value[1:2]):
+            return [_disk(value)]
+        return [_disk(item) for item in value]
+    return [_disk(name) for name in _split(value)]
+
+
+def _integer(value):
+    """Return an integer field, or None if it is empty."""
+    if value is None or value == '':
+        return None
+    return int(value)
+
+
+def _topology(value):
+    """Return a topology record, given as JSON text in a CSV cell."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, dict):
+        return value
+    return json.loads(value)
+
+
+def load_records(path):
+    """Load the flat node records from a CSV, JSON or YAML inventory."""
+    extension = os.path.splitext(path)[1].lower()
+    with open(path) as inventory:
+        if extension == '.csv':
+            return list(csv.DictReader(inventory))
+        if extension == '.json':
+            records = json.load(inventory)
+        elif extension in ('.yml', '.yaml'):
+            if yaml is None:
+                raise ValueError('PyYAML is required to read ' + path)
+            records = yaml.safe_load(inventory)
+        else:
+            raise ValueError('Unknown inventory format: ' + path)
+    # Allow {"nodes": [...]} and a single node (an answer file) as well as a
+    # bare list of nodes
+    if isinstance(records, dict):
+        records = records.get('nodes', [records])
+    return records
+
+
+def load_inventory(path, errors=None):
+    """Return a Node for every record in the inventory file.
+
+    errors: list that receives a 'hostname: field: problem' line for every
+    invalid field, whose node is then left out. Without it the first
+    invalid node raises ValueError with all of its lines.
+    """
+    nodes = [Node(record) for record in load_records(path)]
+    seen = set()
+    valid = []
+    for node in nodes:
+        if node.host.name == '':
+            raise ValueError('Node without a hostname in inventory: ' + path)
+        if node.host.name in seen:
+            raise ValueError('Duplicate hostname in inventory: ' +
+                             node.host.name)
+        seen.add(node.host.name)
+        problems = ['%s: %s' % (node.host.name, problem)
+                    for problem in node.errors()]
+        if not problems:
+            valid.append(node)
+        elif errors is None:
+            raise ValueError('Invalid node in inventory %s:\n%s' %
+                             (path, '\n'.join(problems)))
+        else:
+            errors.extend(problems)
+    return valid
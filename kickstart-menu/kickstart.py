@@ -1,8 +1,21 @@
 from jinja2 import Environment, FileSystemLoader, Template, PackageLoader
+from jinja2.loaders import ChoiceLoader
+import argparse
+import multiprocessing
 import sys
 import os
+import dependencies
+import templatecache
+import writer
 
 KICKSTART_OUTPUT_DIRECTORY = "/build/isolinux/ks/"
+KICKSTART_TEMPLATE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "kickstarts")
+# Filled by "kickstart.py cache" when the ISO is built, read-only at install time
+KICKSTART_BYTECODE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bytecode")
+# Filled by "kickstart.py compile" when the ISO is built
+KICKSTART_COMPILED_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "compiled")
+# Template output is streamed in chunks of this many template events
+KICKSTART_STREAM_CHUNK = 64
 
 def master():
     # data for master node(s)
@@ -10,7 +23,7 @@ def master():
     templateSubfoler = ""
     outDir = ""
     return kickstartScripts, templateSubfoler, outDir
-    
+
 def minion():
     # data for minion node(s)
     kickstartScripts = ["main.ks", "grub.cfg"]
@@ -19,26 +32,184 @@ def minion():
     return kickstartScripts, templateSubfoler, outDir
 
 
-def kickstartGenerator(nodeType, menuData):
+def templateEnvironment(bytecodeDirectory=KICKSTART_BYTECODE_DIRECTORY,
+                        compiledDirectory=KICKSTART_COMPILED_DIRECTORY):
+    # One environment for every node type; templates are named relative to
+    # the kickstarts folder (e.g. "minion/main.ks")
+    loader = FileSystemLoader(KICKSTART_TEMPLATE_DIRECTORY)
+    if compiledDirectory is not None and os.path.isdir(compiledDirectory):
+        # Precompiled modules first, the source templates for anything missing
+        # or edited since "kickstart.py compile"
+        loader = ChoiceLoader([templatecache.ChecksumModuleLoader(compiledDirectory, loader), loader])
+    # Keep the final newline so files like vars can be appended to
+    return Environment(loader=loader, keep_trailing_newline=True,
+                       bytecode_cache=templatecache.open_cache(bytecodeDirectory))
+
+def templateName(templateSubfolder, kickstartScript):
+    # Jinja template names always use forward slashes
+    if templateSubfolder == "":
+        return kickstartScript
+    return templateSubfolder + "/" + kickstartScript
+
+
+def renderKickstarts(env, kickstartScripts, templateSubfolder, directory, fsync=True, **context):
+    # Render templates into directory, skipping templates whose inputs (the
+    # template source and the model attributes it reads) did not change since
+    # the last run. Output is streamed to temporary files that are renamed
+    # into place together; files whose SHA-256 matches the directory's
+    # SHA256SUMS manifest are not rewritten.
+    # Return: number of files written
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    # The ModuleLoader has no source access, read sources from the templates
+    sourceLoader = FileSystemLoader(KICKSTART_TEMPLATE_DIRECTORY)
+    state = dependencies.RenderState(directory)
+    output = writer.OutputWriter(directory, fsync=fsync)
+
+    try:
+        for kickstartScript in kickstartScripts:
+            name = templateName(templateSubfolder, kickstartScript)
+            source = sourceLoader.get_source(env, name)[0]
+            inputs = state.inputs(env, name, source, context)
+            # Skip only if the file on disk still matches SHA256SUMS, so
+            # edited or corrupted output is rendered again
+            if state.unchanged(name, inputs) and output.intact(kickstartScript):
+                continue
+
+            stream = env.get_template(name).stream(**context)
+            stream.enable_buffering(KICKSTART_STREAM_CHUNK)
+            with output.open(kickstartScript) as outFile:
+                stream.dump(outFile)
+            state.rendered(name, inputs)
+
+        state.save(output)
+        written = output.commit()
+    except:
+        output.abort()
+        raise
+
+    return written
+
+
+def kickstartGenerator(nodeType, menuData, outputDirectory=KICKSTART_OUTPUT_DIRECTORY):
     # Get needed data for the requested node type
     kickstartScripts, templateSubfolder, outDir = nodeType()
-    
-    # Get templates
-    os.chdir(sys.path[0])
-    templatesKS = os.getcwd() + "/kickstarts/" + templateSubfolder
-    
-    if not os.path.exists(KICKSTART_OUTPUT_DIRECTORY + outDir):
-        os.makedirs(KICKSTART_OUTPUT_DIRECTORY + outDir)
-    
-    env = Environment(loader= FileSystemLoader(templatesKS))
-    
-    # Loop over all KICKSTART_SCRIPTS defined templates to create fully populated .ks files
-    for index in range(len(kickstartScripts)):
-        config_template = env.get_template(kickstartScripts[index])
-        config_rendered = config_template.render(data=menuData)
-        fileName = KICKSTART_OUTPUT_DIRECTORY + outDir + kickstartScripts[index]
-        outFile = open(fileName, "w")
-        outFile.write(config_rendered)
-        outFile.close()
-    
+
+    env = templateEnvironment()
+
+    # Render all KICKSTART_SCRIPTS defined templates to create fully populated .ks files
+    renderKickstarts(env, kickstartScripts, templateSubfolder, os.path.join(outputDirectory, outDir), data=menuData)
+
     return
+
+
+# Batch rendering. Each worker process builds the Environment once and keeps
+# it (and so every compiled template) for all the nodes it is handed.
+_batchEnvironment = None
+
+def _batchInit():
+    global _batchEnvironment
+    _batchEnvironment = templateEnvironment()
+
+def _batchRender(job):
+    node, nodeDirectory = job
+    # Inventory nodes render the template set of their role
+    if node.role == "master":
+        kickstartScripts, templateSubfolder, outDir = master()
+    else:
+        kickstartScripts, templateSubfolder, outDir = minion()
+
+    # Batch output is a build artifact; renames keep every file whole but
+    # thousands of fsyncs would dominate the run time
+    return renderKickstarts(_batchEnvironment, kickstartScripts, templateSubfolder, nodeDirectory, fsync=False, data=node, node=node)
+
+def batchGenerator(nodes, outputDirectory, processes=None):
+    # Render the template set of every inventory node into
+    # <outputDirectory>/<hostname>/. Returns the number of files written,
+    # unchanged files are not rewritten.
+    jobs = [(node, os.path.join(outputDirectory, node.host.name)) for node in nodes]
+
+    if processes == 1 or len(jobs) < 2:
+        _batchInit()
+        return sum(_batchRender(job) for job in jobs)
+
+    pool = multiprocessing.Pool(processes, initializer=_batchInit)
+    try:
+        # Hand out nodes in chunks so the per-task overhead stays small
+        chunksize = max(1, len(jobs) // ((processes or multiprocessing.cpu_count()) * 4))
+        written = sum(pool.imap_unordered(_batchRender, jobs, chunksize))
+    finally:
+        pool.close()
+        pool.join()
+    return written
+
+
+def precompileTemplates(bytecodeDirectory=KICKSTART_BYTECODE_DIRECTORY):
+    # Compile every template once so its bytecode lands in the cache
+    env = templateEnvironment(bytecodeDirectory, compiledDirectory=None)
+    if env.bytecode_cache is None or env.bytecode_cache.readonly:
+        raise IOError("Cannot write bytecode cache " + bytecodeDirectory)
+    names = env.list_templates()
+    for name in names:
+        env.get_template(name)
+    return names
+
+def compileTemplates(compiledDirectory=KICKSTART_COMPILED_DIRECTORY):
+    # Compile every template into a Python module for the ModuleLoader. On
+    # Python 2 (anaconda) the modules are written as .pyc so nothing is
+    # compiled when they are imported from the read-only ISO.
+    env = Environment(loader=FileSystemLoader(KICKSTART_TEMPLATE_DIRECTORY),
+                      keep_trailing_newline=True)
+    env.compile_templates(compiledDirectory, zip=None, ignore_errors=False,
+                          py_compile=sys.version_info[0] == 2)
+    names = env.list_templates()
+    templatecache.write_checksums(compiledDirectory, env, names)
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render EDCOP kickstarts without the menu.")
+    commands = parser.add_subparsers(dest="command")
+
+    batch = commands.add_parser("batch", help="render every node of an inventory file")
+    batch.add_argument("inventory", help="CSV, JSON or YAML file with one record per node")
+    batch.add_argument("-o", "--output", default=os.path.join(KICKSTART_OUTPUT_DIRECTORY, "nodes"),
+                       help="directory that receives one sub-directory per node")
+    batch.add_argument("-j", "--processes", type=int, default=None,
+                       help="number of worker processes (default: one per CPU)")
+
+    cache = commands.add_parser("cache", help="pre-populate the template bytecode cache")
+    cache.add_argument("-d", "--directory", default=KICKSTART_BYTECODE_DIRECTORY,
+                       help="cache directory (default: %(default)s)")
+
+    compiled = commands.add_parser("compile", help="compile the templates into Python modules")
+    compiled.add_argument("-d", "--directory", default=KICKSTART_COMPILED_DIRECTORY,
+                          help="module directory (default: %(default)s)")
+
+    args = parser.parse_args()
+
+    if args.command == "batch":
+        import inventory
+        errors = []
+        nodes = inventory.load_inventory(args.inventory, errors)
+        if errors:
+            # Render nothing rather than a partial set of nodes
+            sys.stderr.write("Invalid nodes in " + args.inventory + ":\n" + "\n".join(errors) + "\n")
+            return 1
+        written = batchGenerator(nodes, args.output, args.processes)
+        print("Rendered %d files for %d nodes into %s" % (written, len(nodes), args.output))
+    elif args.command == "cache":
+        names = precompileTemplates(args.directory)
+        print("Cached bytecode for %d templates in %s" % (len(names), args.directory))
+    elif args.command == "compile":
+        names = compileTemplates(args.directory)
+        print("Compiled %d templates into %s" % (len(names), args.directory))
+    else:
+        parser.print_help()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
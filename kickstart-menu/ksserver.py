@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+"""Serve minion kickstarts rendered for the requesting node.
+
+Minions booted with ``inst.ks.sendmac`` send their MAC addresses in
+``X-RHN-Provisioning-MAC-<n>`` headers. A node of the inventory matching a
+MAC, the ``mac`` or ``profile`` query parameter or the client address gets
+the minion templates rendered with its own hostname, NICs and disks. Any
+other client gets the static files written at install time, exactly as if
+nginx served them.
+
+Rendered kickstarts are kept in an LRU cache, and concurrent requests for
+the same profile wait for a single render. The server runs behind nginx
+on port 5415, which proxies the minion kickstarts to 127.0.0.1:5416.
+"""
+from __future__ import print_function
+import argparse
+import io
+import itertools
+import os
+import posixpath
+import sys
+import threading
+from collections import OrderedDict
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qs, urlparse
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs, urlparse
+import inventory
+import kickstart
+import substitute
+
+# Minion files served per node and the templates they are rendered from
+TEMPLATES = {'main.ks': 'minion/main.ks', 'storage.ks': 'storage.ks'}
+# /EDCOP/vars entries filled into rendered kickstarts, like post-chroot.ks
+# and firstboot.sh do for the static ones
+PLACEHOLDERS = {'master-ip': 'PXEIP', 'token': 'TOKEN'}
+STATIC_DIRECTORY = '/EDCOP/pxe/deploy/ks/minion'
+INVENTORY_FILE = '/EDCOP/inventory.json'
+LOCAL_ADDRESSES = ('127.0.0.1', '::1')
+
+
+def _stamp(path):
+    """Return what identifies a version of a file, or None if missing."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime, stat.st_size, stat.st_ino)
+
+
+class _Pending(object):
+    """A render in progress that other requests can wait for."""
+
+    def __init__(self):
+        """Init."""
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class RenderCache(object):
+    """Thread-safe LRU cache that renders every key only once.
+
+    Requests for a key that is being rendered wait for that render instead
+    of starting their own, so a burst of identical PXE clients costs one
+    render.
+    """
+
+    def __init__(self, size=256):
+        """Init."""
+        self.size = size
+        self.entries = OrderedDict()
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.renders = 0
+
+    def get(self, key, render):
+        """Return the cached value of key, calling render() on a miss."""
+        with self.lock:
+            if key in self.entries:
+                value = self.entries.pop(key)
+                self.entries[key] = value
+                return value
+            pending = self.pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = self.pending[key] = _Pending()
+        if not owner:
+            pending.event.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.value
+
+        try:
+            pending.value = render()
+        except Exception as error:
+            pending.error = error
+            raise
+        finally:
+            with self.lock:
+                if pending.error is None:
+                    self.entries[key] = pending.value
+                    while len(self.entries) > self.size:
+                        self.entries.popitem(last=False)
+                    self.renders += 1
+                del self.pending[key]
+            pending.event.set()
+        return pending.value
+
+
+class Profiles(object):
+    """Inventory nodes by MAC address, IP address and hostname.
+
+    The inventory is read again when the file changes; a missing inventory
+    matches no node.
+    """
+
+    def __init__(self, path):
+        """Init."""
+        self.path = path
+        self.stamp = None
+        self.lock = threading.Lock()
+        self.macs = {}
+        self.addresses = {}
+        self.hostnames = {}
+
+    def refresh(self):
+        """Reload the inventory if it changed and return its stamp."""
+        stamp = _stamp(self.path)
+        with self.lock:
+            if stamp != self.stamp:
+                nodes = []
+                errors = []
+                try:
+                    if stamp is not None:
+                        nodes = inventory.load_inventory(self.path, errors)
+                except (IOError, OSError, ValueError) as error:
+                    # Keep serving the last good inventory
+                    print('ksserver: %s' % error, file=sys.stderr)
+                    self.stamp = stamp
+                    return self.stamp
+                # Invalid nodes are left out, as if they were not listed
+                for error in errors:
+                    print('ksserver: %s' % error, file=sys.stderr)
+                macs, addresses, hostnames = {}, {}, {}
+                for node in nodes:
+                    hostnames[node.host.name] = node
+                    for mac in node.macs:
+                        macs[mac] = node
+                    for address in node.addresses:
+                        addresses[address] = node
+                # Swap whole indexes so lookups never see a partial one
+                self.macs, self.addresses, self.hostnames = \
+                    macs, addresses, hostnames
+                self.stamp = stamp
+            return self.stamp
+
+    def find(self, profile=None, macs=(), address=None):
+        """Return the node for a request, or None."""
+        if profile is not None:
+            return self.hostnames.get(profile)
+        for mac in macs:
+            if mac.lower() in self.macs:
+                return self.macs[mac.lower()]
+        return self.addresses.get(address)
+
+
+class KickstartServer(ThreadingMixIn, HTTPServer):
+    """Threaded HTTP server rendering minion kickstarts per node."""
+
+    daemon_threads = True
+    # A rack powering on at once opens hundreds of connections together
+    request_queue_size = 512
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, address, inventory_file=INVENTORY_FILE,
+                 vars_file=substitute.VARS_FILE,
+                 static_directory=STATIC_DIRECTORY, cache_size=256):
+        """Init."""
+        HTTPServer.__init__(self, address, KickstartHandler)
+        self.profiles = Profiles(inventory_file)
+        self.vars_file = vars_file
+        self.static_directory = static_directory
+        self.cache = RenderCache(cache_size)
+        self.environment = kickstart.templateEnvironment()
+
+    def kickstart(self, name, profile=None, macs=(), address=None):
+        """Return the kickstart file name for a client."""
+        stamp = self.profiles.refresh()
+        node = self.profiles.find(profile, macs, address)
+        if node is None:
+            path = os.path.join(self.static_directory, name)
+            return self.cache.get(('static', name, _stamp(path)),
+                                  lambda: self._read(path))
+        key = ('node', node.host.name, name, stamp, _stamp(self.vars_file))
+        return self.cache.get(key, lambda: self._render(node, name))
+
+    @staticmethod
+    def _read(path):
+        """Return the text of a static kickstart."""
+        with io.open(path, encoding='utf-8') as static:
+            return static.read()
+
+    def _render(self, node, name):
+        """Render a template for node and fill in the master's values."""
+        template = self.environment.get_template(TEMPLATES[name])
+        text = template.render(data=node, node=node)
+        try:
+            variables = substitute.load_vars(self.vars_file)
+        except (IOError, OSError):
+            variables = {}
+        values = dict((placeholder, variables[variable])
+                      for placeholder, variable in PLACEHOLDERS.items()
+                      if variable in variables)
+        return substitute.Substitution(values).apply(text)
+
+
+class KickstartHandler(BaseHTTPRequestHandler):
+    """GET /deploy/ks/minion/<main.ks|storage.ks>."""
+
+    server_version = 'EDCOP-ksserver/1.0'
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Send the kickstart for the requesting node."""
+        url = urlparse(self.path)
+        name = posixpath.basename(url.path)
+        if name not in TEMPLATES:
+            self.send_error(404)
+            return
+        query = parse_qs(url.query)
+        profile = query.get('profile', [None])[0]
+        macs = self._macs() + query.get('mac', [])
+        address = self.client_address[0]
+        if address in LOCAL_ADDRESSES:
+            # Behind nginx, see webserver/proxy.conf
+            address = self.headers.get('X-Real-IP', address)
+
+        try:
+            body = self.server.kickstart(name, profile, macs, address)
+        except (IOError, OSError):
+            self.send_error(404)
+            return
+        except Exception as error:  # pylint: disable=broad-except
+            self.log_error('Cannot render %s: %r', name, error)
+            self.send_error(500)
+            return
+
+        body = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _macs(self):
+        """Return the MACs of the inst.ks.sendmac headers."""
+        macs = []
+        for index in itertools.count():
+            value = self.headers.get('X-RHN-Provisioning-MAC-%d' % index)
+            if value is None:
+                return macs
+            # "<interface> <mac>"
+            macs.append(value.split()[-1])
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(
+        description='Serve minion kickstarts rendered per node.')
+    parser.add_argument('--listen', default='127.0.0.1',
+                        help='address to listen on (default: %(default)s)')
+    parser.add_argument('--port', type=int, default=5416,
+                        help='port to listen on (default: %(default)s)')
+    parser.add_argument('--inventory', default=INVENTORY_FILE,
+                        help='node inventory (default: %(default)s)')
+    parser.add_argument('--vars', default=substitute.VARS_FILE,
+                        help='master variables (default: %(default)s)')
+    parser.add_argument('--static', default=STATIC_DIRECTORY,
+                        help='kickstarts for unknown clients '
+                             '(default: %(default)s)')
+    parser.add_argument('--cache-size', type=int, default=256,
+                        help='rendered kickstarts kept (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    server = KickstartServer((args.listen, args.port), args.inventory,
+                             args.vars, args.static, args.cache_size)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,312 @@
+#!/usr/bin/env python
+"""Storage layout of a node, rendered into storage.ks.
+
+Every disk used gets one LVM physical volume and volume group. The OS
+logical volumes are sized from the OS disk: proportionally, between a
+minimum and a maximum, so small disks still install and large ones keep
+free space in the volume group for later. /EDCOP/bulk, /EDCOP/fast and
+/EDCOP/shared fill the rest of their disks. Without a dedicated bulk disk,
+/EDCOP/bulk takes what the OS volumes leave of the OS disk.
+
+A data role given several disks gets a software RAID 0 over all of them as
+its physical volume, so its write throughput scales with the number of
+disks: one stripe per disk, in chunks of the role's stripe size.
+
+Disks of unknown size (e.g. inventory records naming only the disk) get
+the growing volumes the kickstart used before.
+"""
+from collections import namedtuple
+
+BOOT_SIZE = 500
+EFI_SIZE = 500
+# Kept free for LVM metadata and partition alignment
+SLACK_SHARE = 0.02
+SLACK_MINIMUM = 128
+# LVM physical extent, in MiB
+EXTENT = 4
+DATA_MINIMUM = 1000
+
+
+class Volume(namedtuple('Volume', ('mountpoint', 'name', 'minimum',
+                                   'maximum', 'share', 'shared_share'))):
+    """An OS logical volume: its size bounds in MiB and its share of the
+    OS disk when the disk is its own, or shared with /EDCOP/bulk.
+    """
+
+    __slots__ = ()
+
+
+# The master also keeps the PXE repository and the registry under /
+OS_VOLUMES = {
+    'master': (Volume('/', 'root', 10000, 100000, 0.55, 0.25),
+               Volume('/home', 'home', 1000, 10000, 0.1, 0.02),
+               Volume('/var/log', 'log', 1500, 25000, 0.3, 0.05),
+               Volume('/tmp', 'tmp', 500, 6000, 0.05, 0.01)),
+    'minion': (Volume('/', 'root', 10000, 50000, 0.55, 0.15),
+               Volume('/home', 'home', 1000, 10000, 0.1, 0.02),
+               Volume('/var/log', 'log', 1500, 25000, 0.3, 0.05),
+               Volume('/tmp', 'tmp', 500, 6000, 0.05, 0.01)),
+}
+# Data volumes in volume group order: mountpoint, logical volume, physical
+# volume
+DATA_VOLUMES = (('bulk', '/EDCOP/bulk', 'bulk', 'pv.bulk'),
+                ('fast', '/EDCOP/fast', 'fast', 'pv.fast'),
+                ('shared', '/EDCOP/shared', 'shared', 'pv.share'))
+DATA_OPTIONS = '--fstype=xfs --fsoptions="noatime"'
+# Smallest and largest md chunk size, in KiB
+STRIPE_MINIMUM = 4
+STRIPE_MAXIMUM = 65536
+
+
+def minimum_os_size(role='minion'):
+    """Return the smallest OS disk the OS volumes fit on, in MiB."""
+    volumes = sum(volume.minimum for volume in _volumes(role))
+    return int(BOOT_SIZE + EFI_SIZE + volumes + max(SLACK_MINIMUM,
+                                                    volumes * SLACK_SHARE))
+
+
+def _volumes(role):
+    """Return the OS volumes of a role."""
+    return OS_VOLUMES.get(role, OS_VOLUMES['minion'])
+
+
+def _extents(size):
+    """Round a size in MiB down to whole physical extents."""
+    return int(size) // EXTENT * EXTENT
+
+
+def _os_sizes(disk, role, shared):
+    """Return the size of each OS volume, or None if the disk's is unknown.
+
+    shared: True if /EDCOP/bulk is on the OS disk too
+    """
+    if disk.size is None:
+        return None
+    space = disk.size - BOOT_SIZE - EFI_SIZE
+    space -= max(SLACK_MINIMUM, space * SLACK_SHARE)
+    sizes = []
+    for volume in _volumes(role):
+        share = volume.shared_share if shared else volume.share
+        sizes.append(_extents(min(volume.maximum,
+                                  max(volume.minimum, space * share))))
+    return sizes
+
+
+class Layout(object):
+    """The partitioning of a node: drives to clear and kickstart lines."""
+
+    def __init__(self):
+        """Init."""
+        self.drives = []
+        self.lines = []
+
+    def add_drive(self, disk):
+        """Clear a disk, once."""
+        if disk.name not in self.drives:
+            self.drives.append(disk.name)
+
+    def part(self, name, disk, size, grow=False, options=''):
+        """Add a partition on the OS disk or a physical volume."""
+        self.lines.append('part %s --size=%d%s%s --asprimary --ondisk %s' %
+                          (name, size, options, ' --grow' if grow else '',
+                           disk.name))
+
+    def raid(self, name, device, members, stripe_size=None):
+        """Add a RAID 0 device over some raid. partitions."""
+        chunk = '' if stripe_size is None else \
+            ' --chunksize=%d' % stripe_size
+        self.lines.append('raid %s --level=0 --device=%s%s %s' %
+                          (name, device, chunk, ' '.join(members)))
+
+    def logvol(self, mountpoint, group, name, size, maximum=None,
+               grow=False, options='--fstype=xfs'):
+        """Add a logical volume."""
+        line = 'logvol %-14s --vgname=%s --name=%-5s %s --size %d' % (
+            mountpoint, group, name, options, size)
+        if maximum is not None:
+            line += ' --maxsize %d' % maximum
+        if grow:
+            line += ' --grow'
+        self.lines.append(line)
+
+
+class DiskSetError(ValueError):
+    """A disk picked for two different sets of disks.
+
+    roles: the two roles picking it, 'os' for the OS disk
+    """
+
+    def __init__(self, disk_name, roles):
+        """Init."""
+        super(DiskSetError, self).__init__(
+            '%s is in two sets of disks' % disk_name)
+        self.roles = roles
+
+
+def _disk_set(disks):
+    """Return a list of disks from a disk, a list of disks or None."""
+    if disks is None:
+        return []
+    if isinstance(disks, (list, tuple)) and \
+            not hasattr(disks, '_fields'):
+        return list(disks)
+    return [disks]
+
+
+def check_stripe_size(stripe_size):
+    """Raise ValueError unless a stripe size is a valid md chunk size."""
+    if stripe_size is None:
+        return
+    if not STRIPE_MINIMUM <= stripe_size <= STRIPE_MAXIMUM or \
+            stripe_size & (stripe_size - 1):
+        raise ValueError('stripe size must be a power of two from %d to '
+                         '%d KiB' % (STRIPE_MINIMUM, STRIPE_MAXIMUM))
+
+
+# pylint: disable=too-many-arguments,too-many-locals
+def plan_layout(os_disk, fast=None, bulk=None, shared=None, role='minion',
+                stripe_sizes=None):
+    """Return the Layout of a node from the disks picked for each role.
+
+    The disks are hardware.Disk records, or lists of them for the data
+    roles; roles picking the same disks share one volume group.
+    stripe_sizes: dict of data role to its stripe size in KiB
+    Return: Layout with no lines without an OS disk
+    Raise: DiskSetError if disk sets overlap or include the OS disk,
+    ValueError for an invalid stripe size
+    """
+    layout = Layout()
+    if os_disk is None:
+        return layout
+    picked = {'bulk': _disk_set(bulk), 'fast': _disk_set(fast),
+              'shared': _disk_set(shared)}
+    stripe_sizes = stripe_sizes or {}
+    on_os = not picked['bulk'] or \
+        [disk.name for disk in picked['bulk']] == [os_disk.name]
+
+    layout.add_drive(os_disk)
+    layout.part('/boot', os_disk, BOOT_SIZE, options=' --fstype=xfs')
+    layout.part('/boot/efi', os_disk, EFI_SIZE, options=' --fstype=efi')
+    sizes = _os_sizes(os_disk, role, on_os)
+    minimum = sum(volume.minimum for volume in _volumes(role))
+    layout.part('pv.os', os_disk, minimum, grow=True, options=' --fstype=xfs')
+    layout.lines.append('volgroup vg00 pv.os')
+    for index, volume in enumerate(_volumes(role)):
+        if sizes is None:
+            layout.logvol(volume.mountpoint, 'vg00', volume.name,
+                          volume.minimum, volume.maximum, grow=True)
+        else:
+            layout.logvol(volume.mountpoint, 'vg00', volume.name,
+                          sizes[index])
+
+    # Volume group of each disk set, in the order of DATA_VOLUMES
+    groups = {(os_disk.name,): 'vg00'}
+    # Disk set and role of each disk used so far
+    used = {os_disk.name: ((os_disk.name,), 'os')}
+    for data_role, mountpoint, name, physical in DATA_VOLUMES:
+        disks = picked[data_role]
+        if not disks:
+            if data_role != 'bulk':
+                continue
+            disks = [os_disk]
+        key = tuple(sorted(set(disk.name for disk in disks)))
+        for disk_name in key:
+            first_key, first_role = used.setdefault(disk_name,
+                                                    (key, data_role))
+            if first_key != key:
+                raise DiskSetError(disk_name, (first_role, data_role))
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = 'vg%02d' % len(groups)
+            members = []
+            for disk in disks:
+                if disk.name not in [member.name for member in members]:
+                    members.append(disk)
+            for disk in members:
+                layout.add_drive(disk)
+            if len(members) == 1:
+                layout.part(physical, members[0], DATA_MINIMUM, grow=True,
+                            options=' --fstype=xfs')
+            else:
+                stripe_size = stripe_sizes.get(data_role)
+                check_stripe_size(stripe_size)
+                raids = []
+                for number, disk in enumerate(members, 1):
+                    raids.append('raid.%s%d' % (data_role, number))
+                    layout.part(raids[-1], disk, DATA_MINIMUM, grow=True)
+                layout.raid(physical, data_role, raids, stripe_size)
+            layout.lines.append('volgroup %s %s' % (group, physical))
+        layout.logvol(mountpoint, group, name, DATA_MINIMUM, grow=True,
+                      options=DATA_OPTIONS)
+    return layout
+
+
+def plan_storage(data, role='minion'):
+    """Return the Layout of the ``storage_*`` of a menu system or node."""
+    return plan_layout(
+        data.storage_os.disk, data.storage_fast.disks,
+        data.storage_bulk.disks, data.storage_shared.disks, role,
+        dict((data_role, getattr(data, 'storage_' + data_role).stripe_size)
+             for data_role in ('fast', 'bulk', 'shared')))
+
+
+def _media(disk):
+    """Sort key of the fastest disk first: NVMe, SSD, HDD, then unknown."""
+    if disk.transport == 'nvme':
+        media = 0
+    elif disk.rotational is False:
+        media = 1
+    elif disk.rotational:
+        media = 2
+    else:
+        media = 3
+    return (media, -(disk.size or 0), disk.name)
+
+
+def _alike(disks, disk):
+    """Return the disks of the same media and size as one, to stripe."""
+    return [other for other in disks
+            if _media(other)[:2] == _media(disk)[:2]]
+
+
+def suggest_disks(harddrives, os_disk=None):
+    """Pick disks for the data roles by media type.
+
+    The fastest remaining disks are for /EDCOP/fast, the largest spinning
+    disks (the largest remaining ones without any) for /EDCOP/bulk and the
+    largest disk left for /EDCOP/shared. Identical disks are picked
+    together, to be striped.
+    Return: dict of role to its list of hardware.Disk, roles without a
+        disk left out
+    """
+    free = [disk for disk in harddrives if disk.size and
+            not disk.removable and
+            (os_disk is None or disk.name != os_disk.name)]
+    picks = {}
+
+    def pick(data_role, disks):
+        """Give some disks to a role."""
+        picks[data_role] = disks
+        for disk in disks:
+            free.remove(disk)
+
+    if os_disk is None and free:
+        # The OS goes on the fastest disk too, the smallest of them
+        fastest = min(_media(disk)[0] for disk in free)
+        pick('os', [min((disk for disk in free
+                         if _media(disk)[0] == fastest),
+                        key=lambda disk: (disk.size, disk.name))])
+    spinning = [disk for disk in free if disk.rotational]
+    if spinning:
+        pick('bulk', _alike(spinning, max(
+            spinning, key=lambda disk: (disk.size, disk.name))))
+    solid = sorted((disk for disk in free if disk.rotational is False),
+                   key=_media)
+    if solid:
+        pick('fast', _alike(solid, solid[0]))
+    free.sort(key=lambda disk: (-disk.size, disk.name))
+    if 'bulk' not in picks and free:
+        pick('bulk', _alike(free, free[0]))
+    if free:
+        pick('shared', free[:1])
+    return picks
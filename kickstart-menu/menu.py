@@ -3,12 +3,23 @@
 """Menu system."""
 
 import sys
+import argparse
 import npyscreen
 import classes
+import hardware
+import inventory
+import layout
+import ranking
+import tuning
 import datetime
 import re
+import threading
+import traceback
 from kickstart import *
 
+# Probe failures are logged here, the menu goes on with what was found
+PROBE_LOG = "/tmp/probe.log"
+
 def str_ljust(_string):
     """Add padding to string."""
     pad = 20
@@ -44,12 +55,96 @@ def update_bootproto_widget(widget):
         widget.parent.display()
 
 
+class HardwareProbe(object):
+    """Probe the hardware off the menu's thread and queue what is found.
+
+    Reading sysfs and libparted can block, so the menu only handles the
+    events: HOST with the probed classes.Host, NICS with the interfaces'
+    hardware.Nic records whenever a link changes, DISKS when the discovery
+    hears from a disk, or gives up on it, and TUNING with the local
+    tuning.Tuning. A step that fails queues PROBE_FAILED with its traceback
+    and the probe goes on without it.
+    """
+
+    def __init__(self, app):
+        """Init, starting the probe."""
+        self.app = app
+        self.nic_monitor = None
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def queue(self, name, payload=None):
+        """Queue an event for the menu, from any thread."""
+        self.app.queue_event(npyscreen.Event(name, payload))
+
+    def _run(self):
+        """Probe the host, then its NICs and tuning."""
+        # pylint: disable=broad-except
+        try:
+            try:
+                host = classes.Host.from_snapshot(
+                    listener=lambda harddrives: self.queue("DISKS", harddrives))
+                self.queue("HOST", host)
+                self.nic_monitor = hardware.NicMonitor(
+                    host.interfaces,
+                    callback=lambda nics: self.queue("NICS", nics))
+                self.queue("NICS", self.nic_monitor.nics)
+            except Exception:
+                self.queue("PROBE_FAILED", traceback.format_exc())
+            try:
+                self.queue("TUNING", tuning.Tuning.local())
+            except Exception:
+                # The menu keeps the default tuning
+                self.queue("PROBE_FAILED", traceback.format_exc())
+        finally:
+            self.done.set()
+
+    def stop(self):
+        """Stop watching the NICs."""
+        if self.nic_monitor is not None:
+            self.nic_monitor.stop()
+
+
 # pylint: disable=too-many-instance-attributes
-class menuSystem(npyscreen.NPSAppManaged):
+class menuSystem(npyscreen.StandardApp):
     """ All Forms registered with an NPSAppManaged instance can access the
     controlling application as self.parentApp.
     """
 
+    def onCleanExit(self):
+        """Stop watching the NICs, with everything probed applied."""
+        self.probe.done.wait()
+        self.process_event_queues()
+        self.probe.stop()
+
+    def process_event(self, event):
+        """Apply the hardware found to the menu before the forms see it."""
+        if event.name == "HOST":
+            # Keep a hostname typed in meanwhile
+            event.payload.name = self.host.name
+            self.host = event.payload
+            self.probed = True
+        elif event.name == "NICS":
+            self.nics = event.payload
+        elif event.name == "TUNING":
+            self.tuning = event.payload
+        elif event.name == "PROBE_FAILED":
+            # Not worth stopping the installation for, the forms still work
+            # with what was probed before the failure
+            try:
+                with open(PROBE_LOG, "a") as log:
+                    log.write(datetime.datetime.now().isoformat() + "\n" + event.payload)
+            except (IOError, OSError):
+                pass
+        return super(menuSystem, self).process_event(event)
+
+    @property
+    def storage_layout(self):
+        """Return the layout.Layout of the picked disks."""
+        return layout.plan_storage(self, role='master')
+
     def calculate_menu_height(self):
         """Calculate menu height for wid2et."""
         return max(2, len(self.host.interfaces))
@@ -60,7 +155,13 @@ class menuSystem(npyscreen.NPSAppManaged):
         self.begin_at = 25
         self.bootproto = ["static", "dhcp"]
         self.teaming = ['yes', 'no']
-        self.host = classes.Host()
+        # Nothing is known about the hardware until the probe's events
+        self.host = classes.Host(interfaces=[], harddrives=[])
+        self.probed = False
+        self.nics = {}
+        # Replaced by the local tuning once probed
+        self.tuning = tuning.Tuning()
+        self.probe = HardwareProbe(self)
         self.network_pxe = classes.PXENetwork()
         self.network_cluster = classes.ClusterNetwork()
         self.network_trust = classes.Network()
@@ -83,10 +184,10 @@ class menuSystem(npyscreen.NPSAppManaged):
         self.addForm("NETWORKPASSIVE", NetworkEditForm,
                      network=self.network_passive, name="Passive")
         self.addForm("STORAGESELECT", StorageSelectForm)
-        self.addForm("STORAGEOS", StorageEditForm, storage=self.storage_os, name="EDCOP OS")
-        self.addForm("STORAGEFAST", StorageEditForm, storage=self.storage_fast, name="Fast")
-        self.addForm("STORAGEBULK", StorageEditForm, storage=self.storage_bulk, name="Bulk")
-        self.addForm("STORAGESHARED", StorageEditForm, storage=self.storage_shared, name="Shared")
+        self.addForm("STORAGEOS", StorageEditForm, storage=self.storage_os, name="EDCOP OS", role="os")
+        self.addForm("STORAGEFAST", StorageEditForm, storage=self.storage_fast, name="Fast", role="fast")
+        self.addForm("STORAGEBULK", StorageEditForm, storage=self.storage_bulk, name="Bulk", role="bulk")
+        self.addForm("STORAGESHARED", StorageEditForm, storage=self.storage_shared, name="Shared", role="shared")
 
 
 # pylint: disable=too-many-instance-attributes
@@ -191,41 +292,10 @@ class MainForm(npyscreen.ActionFormMinimal):
         """Next."""
         
         # Validate all forms have the minimum required data
-        hostnameComplete = False
-        clusterNetworkComplete = False
-        pxeNetworkComplete = False
-        storageComplete = False
-        incompleteForms = ""
-        
-        """ Hostname Validation """
-        if(KICKSTART_MENU.host.name!=""):
-            hostnameComplete = True
-        else:
-            incompleteForms += "\nHostname"
-        
-        """ PXE Network Validation """
-        if((KICKSTART_MENU.network_pxe.ip_address != "") and (KICKSTART_MENU.network_pxe.netmask != "") and (KICKSTART_MENU.network_pxe.interface != None)):
-            if((KICKSTART_MENU.network_pxe.bootproto == "dhcp") and (KICKSTART_MENU.network_pxe.dhcp_start != "") and (KICKSTART_MENU.network_pxe.dhcp_end != "")):
-                pxeNetworkComplete = True
-            elif(KICKSTART_MENU.network_pxe.bootproto == "static"):
-                pxeNetworkComplete = True
-        else:
-            incompleteForms += "\nPXE Network"
-            
-        """ Cluster Network Valdiation """
-        if((KICKSTART_MENU.network_cluster.ip_address != "") and (KICKSTART_MENU.network_cluster.netmask != "") and (KICKSTART_MENU.network_cluster.interface != None)):
-            clusterNetworkComplete = True
-        else:
-            incompleteForms += "\nCluster Network"
-               
-        """ Storage Validation """
-        if((KICKSTART_MENU.storage_os.mountpoint != "") and (KICKSTART_MENU.storage_os.disk != None)):
-            storageComplete = True
-        else:
-            incompleteForms += "\nStorage (EDCOP OS)"
+        incompleteForms = validateMenuData(self.parentApp)
                       
         # Raise an error to the user if they are missing data in any mandatory form
-        if ((hostnameComplete==True) and (clusterNetworkComplete==True) and (pxeNetworkComplete==True) and (storageComplete==True)):
+        if (incompleteForms == ""):
             try:
                 self.editing = False
                 self.parentApp.setNextForm(None)
@@ -320,7 +390,7 @@ class NetForm(npyscreen.ActionFormV2):
                                   begin_entry_at=self.begin_at,
                                   max_height=3,
                                   scroll_exit=True)
-        self.interface = self.add(npyscreen.TitleMultiSelect,
+        self.interface = self.add(npyscreen.TitleVirtualMultiSelect,
                                   name=str_ljust("Interface"),
                                   begin_entry_at=self.begin_at,
                                   #max_height=self.parentApp.calculate_menu_height,
@@ -357,6 +427,34 @@ class NetForm(npyscreen.ActionFormV2):
         self.teaming.values = ['yes', 'no']
         #self.bootproto.value = 0
         self.bootproto.value_changed_callback = update_bootproto_widget
+        self.order = []
+        self.ranking = None
+        self.add_event_hander("NICS", self.ev_nics)
+
+    def rank_interfaces(self, role, selected, taken):
+        """List the best interfaces for the role first and select some."""
+        nics = self.parentApp.nics
+        self.ranking = (role, taken)
+        self.order = rankedInterfaces(self.parentApp.host.interfaces, nics, role, taken)
+        if not selected:
+            selected = ranking.preselect(nics, role, taken)
+        self.interface.value = [self.order.index(name) for name in selected if name in self.order]
+        self.update_interfaces()
+
+    def update_interfaces(self):
+        """Label the interfaces with their current link state."""
+        self.interface.values = interfaceLabels(self.order, self.parentApp.nics)
+
+    def ev_nics(self, event):
+        """Redraw the interfaces when a link changed, or they were probed."""
+        if not self.editing:
+            return
+        if sorted(self.order) != sorted(self.parentApp.host.interfaces):
+            role, taken = self.ranking
+            self.rank_interfaces(role, [self.order[index] for index in self.interface.value or []], taken)
+        else:
+            self.update_interfaces()
+        self.interface.display()
 
     def on_cancel(self):
         """Next."""
@@ -373,12 +471,8 @@ class PXENetForm(NetForm):
         self.name = "EDCOP > Network > PXE"
         self.network = self.parentApp.network_pxe
         # combine interface with current operation state
-        interfaceState = curOperstate(self.parentApp.host.interfaces)
-        state = ['']*len(self.parentApp.host.interfaces)
-        for idx in range(len(self.parentApp.host.interfaces)):
-            state[idx] = self.parentApp.host.interfaces[idx] + " (" + interfaceState[idx] + ")"
-            
-        self.interface.values = state
+        self.rank_interfaces('pxe', interfaceNames(self.network.interface),
+                             interfaceNames(self.parentApp.network_cluster.interface))
         self.ipaddress.value = self.network.ip_address
         self.netmask.value = self.network.netmask
         self.dhcp_start.value = self.network.dhcp_start
@@ -393,7 +487,7 @@ class PXENetForm(NetForm):
         errors = ''
         try:
             self.network.bootproto = self.parentApp.bootproto[self.bootproto.value[0]]
-            self.network.interface = self.parentApp.host.interfaces[self.interface.value[0]]
+            self.network.interface = self.order[self.interface.value[0]]
             
             if (validateIP(self.ipaddress.value) == True):
                 self.network.ip_address = self.ipaddress.value
@@ -432,12 +526,8 @@ class ClusterNetForm(NetForm):
         self.network = self.parentApp.network_cluster
         self.ipaddress.value = self.network.ip_address
         # combine interface with current operation state
-        interfaceState = curOperstate(self.parentApp.host.interfaces)
-        state = ['']*len(self.parentApp.host.interfaces)
-        for idx in range(len(self.parentApp.host.interfaces)):
-            state[idx] = self.parentApp.host.interfaces[idx] + " (" + interfaceState[idx] + ")"
-            
-        self.interface.values = state
+        self.rank_interfaces('cluster', interfaceNames(self.network.interface),
+                             interfaceNames(self.parentApp.network_pxe.interface))
         self.ipaddress.value = self.network.ip_address
         self.netmask.value = self.network.netmask
         self.dns1.value = self.network.dns1
@@ -455,7 +545,7 @@ class ClusterNetForm(NetForm):
         try:
             interfaceList = []
             for index in range(len(self.interface.value)):
-                interfaceList.append(self.parentApp.host.interfaces[self.interface.value[index]])
+                interfaceList.append(self.order[self.interface.value[index]])
             self.network.interface = interfaceList
             self.network.bootproto = self.parentApp.bootproto[self.bootproto.value[0]]
             self.network.teaming = self.parentApp.teaming[self.teaming.value[0]]
@@ -490,6 +580,11 @@ class ClusterNetForm(NetForm):
             
             # If there are no issues, jump to parent form, otherwise, alert so user can fix
             if (errors == ''):
+                # A team runs at the pace of its slowest member, let the user reconsider
+                if self.network.teaming == 'yes' and len(interfaceList) > 1:
+                    warnings = ranking.team_warnings(self.parentApp.nics, interfaceList)
+                    if warnings and not npyscreen.notify_yes_no("\n".join(warnings) + "\n\nUse these interfaces anyway?", title="Team"):
+                        return
                 self.parentApp.switchFormPrevious()
             else:
                 formMessage = "There appears to be missing or invalid data on the following fields: \n  \n  \n" + errors
@@ -503,7 +598,7 @@ class NetworkEditForm(npyscreen.ActionFormV2):
 
     def __init__(self, network, name, *args, **keywords):
         """Init."""
-        super(NetworkEditForm, self).__init__()
+        super(NetworkEditForm, self).__init__(*args, **keywords)
         self.network = network
         self.name = "EDCOP > Network > " + name
 
@@ -513,12 +608,14 @@ class NetworkEditForm(npyscreen.ActionFormV2):
                                 name=str_ljust("Enable Interface"),
                                 max_height=3, scroll_exit=True,
                                 begin_entry_at=25)
-        self.interface = self.add(npyscreen.TitleSelectOne,
+        self.interface = self.add(npyscreen.TitleVirtualSelectOne,
                                   name=str_ljust("Interface"),
                                   scroll_exit=True,
                                   begin_entry_at=25,
                                   editable=True)
         self.enabled.value_changed_callback = update_enabled_widget
+        self.order = []
+        self.add_event_hander("NICS", self.ev_nics)
 
     # pylint: disable=invalid-name
     def beforeEditing(self):
@@ -526,7 +623,23 @@ class NetworkEditForm(npyscreen.ActionFormV2):
         self.enabled.values = ["Enabled",
                                "Disabled"]
         self.enabled.value = [1]
-        self.interface.values = self.parentApp.host.interfaces
+        self.update_interfaces()
+
+    def update_interfaces(self):
+        """List the interfaces, keeping the one selected."""
+        # SR-IOV capable ports first, the PXE and cluster ports last
+        selected = [self.order[index] for index in self.interface.value or [] if index < len(self.order)]
+        nics = self.parentApp.nics
+        taken = interfaceNames(self.parentApp.network_pxe.interface) + interfaceNames(self.parentApp.network_cluster.interface)
+        self.order = rankedInterfaces(self.parentApp.host.interfaces, nics, 'sensor', taken)
+        self.interface.values = interfaceLabels(self.order, nics)
+        self.interface.value = [self.order.index(name) for name in selected if name in self.order]
+
+    def ev_nics(self, event):
+        """Redraw the interfaces when a link changed, or they were probed."""
+        if self.editing:
+            self.update_interfaces()
+            self.interface.display()
 
     def on_ok(self):
         """Ok."""
@@ -534,7 +647,7 @@ class NetworkEditForm(npyscreen.ActionFormV2):
         if self.enabled.value == [0]:
             try:
                 self.network.enabled = True
-                self.network.interface = self.parentApp.host.interfaces[self.interface.value[0]]
+                self.network.interface = self.order[self.interface.value[0]]
             except IndexError:
                 npyscreen.notify_confirm("Please select a valid interface", title="Error")
 
@@ -546,8 +659,10 @@ class NetworkEditForm(npyscreen.ActionFormV2):
 class StorageEditForm(npyscreen.ActionFormV2):
     """Form."""
 
-    def __init__(self, storage, name, *args, **keywords):
+    def __init__(self, storage, name, role=None, *args, **keywords):
         """Init."""
+        # create() picks the disk widget by role
+        self.role = role
         super(StorageEditForm, self).__init__(*args, **keywords)
         self.storage = storage
         self.name = "EDCOP > Storage > " + name
@@ -555,22 +670,93 @@ class StorageEditForm(npyscreen.ActionFormV2):
     def create(self):
         """Add."""
         self.mount = self.add(npyscreen.TitleText, name="Mountpoint")
-        self.disk = self.add(npyscreen.TitleSelectOne, name="Disk", scroll_exit=True)
+        if self.role == "os":
+            self.disk = self.add(npyscreen.TitleVirtualSelectOne, name="Disk", scroll_exit=True, max_height=-2)
+        else:
+            # Data disks are striped together, one stripe per disk
+            self.stripe_size = self.add(npyscreen.TitleText, name="Stripe KiB", begin_entry_at=16)
+            self.disk = self.add(npyscreen.TitleVirtualMultiSelect, name="Disks", scroll_exit=True, max_height=-2)
+        self.probing = self.add(npyscreen.FixedText, editable=False, value="")
+        self.harddrives = []
+        self.add_event_hander("HOST", self.ev_disks)
+        self.add_event_hander("DISKS", self.ev_disks)
 
     # pylint: disable=invalid-name
     def beforeEditing(self):
         """Refresh."""
         self.mount.value = self.storage.mountpoint
-        self.disk.values = self.parentApp.host.harddrives
+        if self.role != "os":
+            self.stripe_size.value = "" if self.storage.stripe_size is None else str(self.storage.stripe_size)
+        self.update_disks()
+        if not self.disk.value:
+            self.suggest_disk()
+
+    def suggest_disk(self):
+        """Select the disks the media types suggest for this role."""
+        # NVMe and SSDs for fast storage, the largest spinning disks for bulk
+        disks = self.storage.disks
+        if not disks:
+            suggested = layout.suggest_disks(self.harddrives, self.parentApp.storage_os.disk)
+            disks = suggested.get(self.role, [])
+        names = [harddrive.name for harddrive in self.harddrives]
+        self.disk.value = [names.index(disk.name) for disk in disks if disk.name in names]
+
+    def update_disks(self):
+        """Show the disks found so far."""
+        # host.harddrives grows while disks are probed; the selection
+        # indexes this snapshot and follows its disks when the list changes
+        selected = [self.harddrives[index].name for index in self.disk.value or []]
+        self.harddrives = list(self.parentApp.host.harddrives)
+        self.disk.values = self.harddrives
+        names = [disk.name for disk in self.harddrives]
+        self.disk.value = [names.index(name) for name in selected if name in names]
+        if self.parentApp.probed:
+            self.probing.value = discoveryStatus(self.parentApp.host.discovery)
+        else:
+            self.probing.value = "Probing the disks..."
+
+    def ev_disks(self, event):
+        """Pick up the disks probed, or that answered, since the form was drawn."""
+        if not self.editing:
+            return
+        suggest = not self.harddrives
+        self.update_disks()
+        if suggest and not self.disk.value:
+            self.suggest_disk()
+        self.display()
 
     def on_ok(self):
         """Ok."""
-        try:
-            self.storage.mountpoint = self.mount.value
-            self.storage.disk = self.parentApp.host.harddrives[self.disk.value[0]]
-            self.parentApp.setNextForm("STORAGESELECT")
-        except IndexError:
+        disks = [self.harddrives[index] for index in sorted(self.disk.value or [])]
+        if not disks:
             npyscreen.notify_confirm("Please select a valid storage drive", title="Error")
+            return
+        for disk in disks:
+            if disk.size is None:
+                npyscreen.notify_confirm(disk.name + " did not respond when probed. Please select another drive", title="Error")
+                return
+        if self.role == "os" and disks[0].size < layout.minimum_os_size("master"):
+            npyscreen.notify_confirm(disks[0].name + " is too small for the OS, it needs at least " + str(layout.minimum_os_size("master") // 1024 + 1) + " GiB", title="Error")
+            return
+        stripe_size = self.storage.stripe_size
+        if self.role != "os":
+            try:
+                stripe_size = int(self.stripe_size.value) if self.stripe_size.value.strip() else None
+                layout.check_stripe_size(stripe_size)
+            except ValueError:
+                npyscreen.notify_confirm("The stripe size must be a power of two from " + str(layout.STRIPE_MINIMUM) + " to " + str(layout.STRIPE_MAXIMUM) + " KiB, or empty", title="Error")
+                return
+        # Plan the layout with these disks to catch disks picked for two roles
+        previous = (self.storage.disks, self.storage.stripe_size)
+        self.storage.disks, self.storage.stripe_size = disks, stripe_size
+        try:
+            self.parentApp.storage_layout
+        except ValueError as error:
+            self.storage.disks, self.storage.stripe_size = previous
+            npyscreen.notify_confirm(str(error) + ". A disk can only be striped with the same disks for every role", title="Error")
+            return
+        self.storage.mountpoint = self.mount.value
+        self.parentApp.setNextForm("STORAGESELECT")
 
     def on_cancel(self):
         """Cancel."""
@@ -588,6 +774,101 @@ class EDCOPOSForm(StorageEditForm):
     
 # Helper functions
 
+def discoveryStatus(discovery):
+    # Describe a classes.DiskDiscovery for the storage forms
+    # Return: "" once every disk answered
+    if discovery is None:
+        return ""
+    status = ""
+    pending = discovery.pending()
+    if pending:
+        status = "Probing " + str(pending) + " more disk(s)... "
+    if discovery.slow:
+        status += "No response: " + ", ".join(sorted(discovery.slow))
+    return status
+
+def validateMenuData(menuData):
+    # Validate all forms have the minimum required data
+    # Return: the names of the incomplete forms, one per line ("" if complete)
+    incompleteForms = ""
+    
+    """ Hostname Validation """
+    if(menuData.host.name==""):
+        incompleteForms += "\nHostname"
+    
+    """ PXE Network Validation """
+    pxeNetworkComplete = False
+    if((menuData.network_pxe.ip_address != "") and (menuData.network_pxe.netmask != "") and (menuData.network_pxe.interface != None)):
+        if((menuData.network_pxe.bootproto == "dhcp") and (menuData.network_pxe.dhcp_start != "") and (menuData.network_pxe.dhcp_end != "")):
+            pxeNetworkComplete = True
+        elif(menuData.network_pxe.bootproto == "static"):
+            pxeNetworkComplete = True
+    if(pxeNetworkComplete == False):
+        incompleteForms += "\nPXE Network"
+        
+    """ Cluster Network Valdiation """
+    if((menuData.network_cluster.ip_address == "") or (menuData.network_cluster.netmask == "") or (menuData.network_cluster.interface == None)):
+        incompleteForms += "\nCluster Network"
+           
+    """ Storage Validation """
+    if((menuData.storage_os.mountpoint == "") or (menuData.storage_os.disk == None)):
+        incompleteForms += "\nStorage (EDCOP OS)"
+    
+    return incompleteForms
+
+
+def validateAnswers(menuData):
+    # Apply the field checks the PXE, Cluster and storage forms run on OK
+    # Return: the names of the invalid fields, one per line ("" if valid)
+    errors = ""
+    
+    if (validateIP(menuData.network_pxe.ip_address) != True):
+        errors += "\nPXE IP Address"
+    if (validateNetmask(menuData.network_pxe.netmask) != True):
+        errors += "\nPXE Netmask"
+    
+    if (menuData.network_cluster.bootproto == "static"):
+        if (validateIP(menuData.network_cluster.ip_address) != True):
+            errors += "\nCluster IP Address"
+        if (validateNetmask(menuData.network_cluster.netmask) != True):
+            errors += "\nCluster Netmask"
+        if (validateIP(menuData.network_cluster.dns1) != True):
+            errors += "\nDNS1"
+        if (validateIP(menuData.network_cluster.dns2) != True):
+            errors += "\nDNS2"
+        if (validateIP(menuData.network_cluster.gateway) != True):
+            errors += "\nGateway"
+    
+    # Disk sets and stripe sizes the storage form would refuse
+    for error in inventory.storage_errors(menuData):
+        errors += "\n" + error
+    
+    return errors
+
+def answerFileGenerator(answerFile, outputDirectory=KICKSTART_OUTPUT_DIRECTORY):
+    # Generate the kickstarts from a JSON/YAML answer file instead of the menu.
+    # Curses is never initialized so this can run unattended in %pre.
+    # Return: exit status, 1 if the answers are incomplete or invalid
+    # The answers describe the master, which sizes its OS volumes for the repositories
+    record = inventory.load_records(answerFile)[0]
+    record.setdefault("role", "master")
+    answers = inventory.Node(record)
+    if (answers.tuning.hugepages == None):
+        # The answers are for this machine, size its hugepages from its memory
+        answers.tuning = tuning.Tuning.local()
+    
+    errors = validateMenuData(answers) + validateAnswers(answers)
+    if (errors != ""):
+        sys.stderr.write("There appears to be missing or invalid data in " + answerFile + ": \n" + errors + "\n")
+        return 1
+    
+    logData(answers)
+    
+    kickstartGenerator(master, answers, outputDirectory)
+    kickstartGenerator(minion, answers, outputDirectory)
+    
+    return 0
+
 def logData(KICKSTART_MENU):
     # Dump various data to a log file for TSHOOT purposes
     outFile = open("/tmp/dev.log", "w")
@@ -627,13 +908,31 @@ def networkID(ip, netmask):
     
     return '.'.join(str(idx) for idx in network)
 
-def curOperstate(interfaces):
-    # Get the operational status of every NIC
-    state = []
-    for name in os.listdir('/sys/class/net'):
-            if not name == 'lo':
-                state.append(open("/sys/class/net/"+name+"/operstate", "r").read().strip('\n'))           
-    return state
+def interfaceLabels(interfaces, nics):
+    # Describe each interface with its link state, speed and capabilities
+    # Return: one label per interface, in the same order
+    labels = []
+    for name in interfaces:
+        nic = nics.get(name)
+        if nic is None:
+            labels.append(name + " (missing)")
+        else:
+            labels.append(name + " (" + ranking.describe(nic) + ")")
+    return labels
+
+def rankedInterfaces(interfaces, nics, role, taken):
+    # Order the interfaces from best to worst for a network role
+    # Interfaces that could not be read are kept at the end
+    order = [name for name in ranking.rank(nics, role, taken) if name in interfaces]
+    return order + [name for name in interfaces if name not in order]
+
+def interfaceNames(interface):
+    # A network's interface is a name, a list of names for a team, or None
+    if not interface:
+        return []
+    if isinstance(interface, list):
+        return list(interface)
+    return [interface]
 
 def validateIP(IP):
     # validate that a passed in IP is valid or not.
@@ -694,6 +993,14 @@ def validateNetmask(mask):
 
       
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="EDCOP kickstart menu.")
+    parser.add_argument("--answers", help="generate the kickstarts from this JSON/YAML answer file without the menu")
+    parser.add_argument("--output", default=KICKSTART_OUTPUT_DIRECTORY, help="kickstart output directory for --answers")
+    args = parser.parse_args()
+    
+    if args.answers:
+        sys.exit(answerFileGenerator(args.answers, args.output))
+    
     try:
         KICKSTART_MENU = menuSystem()
         KICKSTART_MENU.run()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+"""Plan NIC queues, ring buffers and IRQ affinity from the CPU layout.
+
+Sensor NICs get one RSS queue per CPU of their NUMA node's IRQ core (see
+topology.plan_cores) and their largest ring buffers, so bursts are not
+dropped while the sensors catch up. Every other NIC gets one queue per
+housekeeping CPU of its NUMA node. The IRQs of each NIC's queues are
+spread over those CPUs and kept out of irqbalance.
+
+The plan runs at every boot, before the network comes up, from a oneshot
+unit. Queue counts are capped by what the NIC reports, so the script is
+safe to run again and on hardware that differs from the plan.
+"""
+from collections import namedtuple
+import topology
+
+SCRIPT_PATH = '/usr/local/sbin/EDCOP-nictuning.sh'
+UNIT_NAME = 'EDCOP-nictuning.service'
+# Drivers whose queue count cannot be changed with ethtool -L
+FIXED_QUEUE_DRIVERS = ('e1000', 'e1000e', 'vmxnet3')
+
+# tune_nic <interface> <queues or -> <max rings: yes or no> <IRQ CPUs>
+_FUNCTION = r'''tune_nic() {
+    dev=$1
+    [ -d /sys/class/net/$dev/device ] || return 0
+    if [ "$2" != - ]; then
+        max=$(ethtool -l $dev 2>/dev/null | awk '/^Pre-set/ {p = 1} /^Current/ {p = 0} p && /^Combined:/ {print $2}')
+        current=$(ethtool -l $dev 2>/dev/null | awk '/^Current/ {c = 1} c && /^Combined:/ {print $2}')
+        queues=$2
+        if [ -n "$max" ] && [ "$max" -gt 0 ]; then
+            [ "$queues" -gt "$max" ] && queues=$max
+            [ "$queues" != "$current" ] && ethtool -L $dev combined $queues
+        fi
+    fi
+    if [ "$3" = yes ]; then
+        set -- "$@" $(ethtool -g $dev 2>/dev/null | awk '/^Pre-set/ {p = 1} /^Current/ {p = 0} p && /^RX:/ {rx = $2} p && /^TX:/ {tx = $2} END {print rx, tx}')
+        [ -n "$6" ] && ethtool -G $dev rx $5 tx $6
+    fi
+    cpus=(${4//,/ })
+    index=0
+    for irq in $(ls /sys/class/net/$dev/device/msi_irqs 2>/dev/null | sort -n); do
+        [ -w /proc/irq/$irq/smp_affinity_list ] || continue
+        echo ${cpus[index % ${#cpus[@]}]} > /proc/irq/$irq/smp_affinity_list && pinned="$pinned --banirq=$irq"
+        index=$((index + 1))
+    done
+    return 0
+}'''
+
+
+class NicPlan(namedtuple('NicPlan', ('name', 'queues', 'max_rings',
+                                     'irq_cpus'))):
+    """Queue count (None to leave it), ring sizes and IRQ CPUs of a NIC."""
+
+    __slots__ = ()
+
+    def command(self):
+        """Return the tune_nic call applying the plan."""
+        return 'tune_nic %s %s %s %s' % (
+            self.name, '-' if self.queues is None else self.queues,
+            'yes' if self.max_rings else 'no',
+            ','.join(str(cpu) for cpu in self.irq_cpus))
+
+
+def cpumask(cpus):
+    """Return the hexadecimal CPU mask of some CPUs, in 32 bit groups."""
+    mask = 0
+    for cpu in cpus:
+        mask |= 1 << cpu
+    text = '%x' % mask
+    groups = []
+    while text:
+        groups.insert(0, text[-8:])
+        text = text[:-8]
+    return ','.join(groups) or '0'
+
+
+def plan_nics(layout, cores, sensor_interfaces):
+    """Return the NicPlan of every physical NIC of a topology.Topology.
+
+    cores: topology.CorePlan of the sensor cores, or None
+    sensor_interfaces: names of the sensor NICs
+    """
+    cpus = sorted(cpu for node in layout.nodes.values() for cpu in node)
+    housekeeping = cores.housekeeping if cores is not None else cpus
+    plans = []
+    for name in sorted(layout.nics):
+        driver = layout.drivers.get(name)
+        if driver is None:
+            # Bonds, bridges and other software interfaces
+            continue
+        local = set(layout.nodes.get(layout.nic_node(name), cpus))
+        sensor = name in sensor_interfaces
+        if sensor and cores is not None:
+            irq_cpus = [cpu for cpu in cores.irq if cpu in local] or \
+                cores.irq
+        else:
+            irq_cpus = [cpu for cpu in housekeeping if cpu in local] or \
+                housekeeping
+        queues = len(irq_cpus)
+        if layout.channels.get(name):
+            queues = min(queues, layout.channels[name])
+        if driver in FIXED_QUEUE_DRIVERS:
+            queues = None
+        plans.append(NicPlan(name, queues, sensor, irq_cpus))
+    return plans
+
+
+def boot_script(plans, banned_cpus=()):
+    """Return the shell script applying some NicPlans at boot.
+
+    banned_cpus: CPUs irqbalance must not move any interrupt to
+    """
+    lines = ['#!/bin/bash',
+             '# Written by the EDCOP installer, see nictuning.py',
+             _FUNCTION,
+             'pinned=']
+    lines.extend(plan.command() for plan in plans)
+    lines.append('# Keep irqbalance away from the pinned IRQs and the '
+                 'sensor cores')
+    lines.append('sed -i "/^IRQBALANCE_ARGS=/d; /^IRQBALANCE_BANNED_CPUS=/d"'
+                 ' /etc/sysconfig/irqbalance')
+    lines.append('echo "IRQBALANCE_ARGS=\\"${pinned# }\\"" >> '
+                 '/etc/sysconfig/irqbalance')
+    if banned_cpus:
+        lines.append('echo "IRQBALANCE_BANNED_CPUS=%s" >> '
+                     '/etc/sysconfig/irqbalance' % cpumask(banned_cpus))
+    return '\n'.join(lines) + '\n'
+
+
+def boot_unit():
+    """Return the systemd unit running the boot script."""
+    return '\n'.join([
+        '[Unit]',
+        'Description=EDCOP NIC queues, rings and IRQ affinity',
+        'After=systemd-udev-settle.service',
+        'Before=network-pre.target irqbalance.service',
+        'Wants=network-pre.target',
+        '',
+        '[Service]',
+        'Type=oneshot',
+        'ExecStart=' + SCRIPT_PATH,
+        '',
+        '[Install]',
+        'WantedBy=multi-user.target',
+        ''])
+
+
+def describe(plans):
+    """Return the plans as text, one NIC per line."""
+    return '\n'.join('%s: %s queues, %s rings, IRQs on %s' % (
+        plan.name, 'driver' if plan.queues is None else plan.queues,
+        'max' if plan.max_rings else 'default',
+        topology.format_cpulist(plan.irq_cpus)) for plan in plans)
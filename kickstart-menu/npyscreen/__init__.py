@@ -30,6 +30,7 @@ from .fmFormMultiPage           import FormMultiPage, FormMultiPageAction,\
                                        FormMultiPageActionWithMenus, FormMultiPageWithMenus
 
 from .npysNPSFilteredData       import NPSFilteredDataBase, NPSFilteredDataList
+from .npysVersionedList         import VersionedList
 
 from .wgbutton                  import MiniButton
 from .wgbutton                  import MiniButtonPress
@@ -59,6 +60,8 @@ from .wgFormControlCheckbox     import FormControlCheckbox
 from .wgautocomplete            import TitleFilename, Filename, Autocomplete
 from .muMenu                    import Menu
 from .wgselectone               import SelectOne, TitleSelectOne
+from .wgvirtuallist             import VirtualMultiLine, VirtualSelectOne, VirtualMultiSelect, \
+                                       TitleVirtualMultiLine, TitleVirtualSelectOne, TitleVirtualMultiSelect
 from .wgdatecombo               import DateCombo, TitleDateCombo
 
 from .npysTree import TreeData
@@ -4,18 +4,18 @@ from .apNPSApplicationManaged import NPSAppManaged
 from .eveventhandler import EventHandler
 
 class NPSEventQueue(object):
+    """Events in the order they were put.  Other threads may put events while the
+    application gets them: appending to and popping from a deque are atomic."""
     def __init__(self):
         self.interal_queue = collections.deque()
     
     def get(self, maximum=None):
-        if maximum is None:
-            maximum = -1
-        counter = 1
-        while counter != maximum:
+        counter = 0
+        while maximum is None or counter < maximum:
             try:
-                yield self.interal_queue.pop()
+                yield self.interal_queue.popleft()
             except IndexError:
-                raise StopIteration
+                return
             counter += 1
     
     def put(self, event):
@@ -40,9 +40,14 @@ class StandardApp(NPSAppManaged, EventHandler):
         # Parent NPSAppManaged does not define this, so no need to call.
         self.process_event_queues(max_events_per_queue=self.max_events_per_queue)
     
+    def _internal_adjust_widgets(self):
+        # Called after every keypress, so events are not held up while the user types
+        # faster than the keypress timeout.
+        self.process_event_queues(max_events_per_queue=self.max_events_per_queue)
         
     def initalize_application_event_queues(self):
-        # in the standard application the event queue is not threaded so...
+        # Events are handled in the application's thread, but may be queued from any
+        # other, e.g. by threads watching hardware.
         main_queue = self.MAINQUEUE_TYPE()
         self.event_queues['MAINQUEUE'] = main_queue
     
@@ -66,7 +71,8 @@ class StandardApp(NPSAppManaged, EventHandler):
         if not self.event_directory[event.name]:
             del self.event_directory[event.name]
             return True
-        for registered_object in self.event_directory[event.name]:
+        # A copy, as handlers may register or go away meanwhile
+        for registered_object in list(self.event_directory[event.name]):
             result = registered_object.handle_event(event)
             if result is False:
                 discard_list.append(registered_object)
@@ -306,19 +306,47 @@ class _FormBase(proto_fm_screen_area.ScreenArea,
             self.show_atx = 0
 
 
+    def _display_layout(self):
+        """Everything that, when changed, means the whole form has to be redrawn"""
+        return (self.curses_pad, self.name, self.help, self.color, self.framed, self.editing,
+                tuple((id(w), w.rely, w.relx, w.height, w.width) for w in self._widgets__))
+
+    def erase(self):
+        self._displayed_layout = None
+        super(_FormBase, self).erase()
+
     def display(self, clear=False):
+        """Draw the form.  Only the widgets that changed since they were last drawn are
+        redrawn, unless clear is True or the form itself changed (see _display_layout)."""
         #APPLICATION_THEME_MANAGER.setTheme(self)
         if curses.has_colors() and not npysGlobalOptions.DISABLE_ALL_COLORS:
             self.curses_pad.attrset(0)
             color_attribute = self.theme_manager.findPair(self, self.color)
             self.curses_pad.bkgdset(' ', color_attribute)
             self.curses_pad.attron(color_attribute)
-        self.curses_pad.erase()
-        self.draw_form()
-        for w in [wg for wg in self._widgets__ if wg.hidden]:
-            w.clear()
-        for w in [wg for wg in self._widgets__ if not wg.hidden]:
-            w.update(clear=clear)
+        layout = self._display_layout()
+        if clear or layout != getattr(self, '_displayed_layout', None):
+            self.curses_pad.erase()
+            self.draw_form()
+            for w in [wg for wg in self._widgets__ if wg.hidden]:
+                w.clear()
+            for w in [wg for wg in self._widgets__ if not wg.hidden]:
+                w.update(clear=clear)
+            for w in self._widgets__:
+                w.mark_displayed()
+            self._displayed_layout = layout
+        else:
+            for w in self._widgets__:
+                if not w.needs_display():
+                    continue
+                if w.hidden:
+                    w.clear()
+                else:
+                    w.update(clear=True)
+                w.mark_displayed()
+            # Copy every line of the pad again, not only the ones drawn on, in case a popup
+            # covered the form.  curses only sends the characters that differ from the screen.
+            self.curses_pad.touchwin()
 
         self.refresh()
 
@@ -0,0 +1,63 @@
+#!/usr/bin/python
+"""A list that counts its changes, so widgets can tell in O(1) whether the
+values they displayed last are still the current ones."""
+import copy
+
+
+def _bumps(method_name):
+    base = getattr(list, method_name)
+
+    def method(self, *args, **keywords):
+        result = base(self, *args, **keywords)
+        self.version += 1
+        return result
+    method.__name__ = method_name
+    method.__doc__ = base.__doc__
+    return method
+
+
+class VersionedList(list):
+    """A list whose version goes up every time it is changed in place.
+
+    Replacing an item by an equal one still counts as a change, and changes
+    made to the items themselves are not seen.
+    """
+    def __init__(self, *args, **keywords):
+        super(VersionedList, self).__init__(*args, **keywords)
+        self.version = 0
+
+
+for _method_name in ('append', 'extend', 'insert', 'pop', 'remove',
+                     'reverse', 'sort', '__setitem__', '__delitem__',
+                     '__iadd__', '__imul__',
+                     # Python 2 only
+                     '__setslice__', '__delslice__'):
+    if hasattr(list, _method_name):
+        setattr(VersionedList, _method_name, _bumps(_method_name))
+del _method_name
+
+
+class _Stamp(object):
+    """The version of a VersionedList when it was displayed."""
+    __slots__ = ('values', 'version')
+
+    def __init__(self, values):
+        # Holding on to the list keeps its id from being reused
+        self.values  = values
+        self.version = values.version
+
+
+def snapshot(values):
+    """Return what unchanged() needs to tell whether values changed later.
+
+    This is O(1) for a VersionedList, and a copy of anything else."""
+    if isinstance(values, VersionedList):
+        return _Stamp(values)
+    return copy.copy(values)
+
+
+def unchanged(last, values):
+    """Return True if values is still what snapshot() was given."""
+    if isinstance(last, _Stamp):
+        return last.values is values and last.version == values.version
+    return last == values
@@ -7,6 +7,7 @@ from . import wgtextbox  as textbox
 
 class SimpleGrid(widget.Widget):
     _contained_widgets    = textbox.Textfield
+    _safe_to_display_cache = False # Rows are changed in place
     default_column_number = 4
     additional_y_offset   = 0
     additional_x_offset   = 0
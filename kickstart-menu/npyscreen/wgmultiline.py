@@ -9,6 +9,7 @@ from . import fmPopup        as Popup
 import weakref
 import collections
 import copy
+from .npysVersionedList import VersionedList, snapshot, unchanged
 
 MORE_LABEL = "- more -" # string to tell user there are more options
 
@@ -90,14 +91,34 @@ the same effect can be achieved by altering the __str__() method of displayed ob
         #These are just to do some optimisation tricks
         self._last_start_display_at = None
         self._last_cursor_line = None
-        self._last_values = copy.copy(values)
-        self._last_value = copy.copy(value)
+        self._last_values = snapshot(values)
+        self._last_value = snapshot(value)
         self._last_filter = None
+        self._last_displayed_filter = None
+        self._last_filtered_values = None
+        self._last_filtered_indexes = []
         self._filtered_values_cache = []
+        self._display_strings = {}
+        self._display_strings_stamp = None
 
         #override - it looks nicer.
         if self.scroll_exit: self.slow_scroll=True
     
+    def get_values(self):
+        return self._values
+
+    def set_values(self, values):
+        # Plain lists are wrapped so that a redraw can tell whether they
+        # changed by comparing a version instead of copying them.
+        if type(values) is list:
+            values = VersionedList(values)
+        self._values = values
+
+    def del_values(self):
+        del self._values
+
+    values = property(get_values, set_values, del_values)
+
     def resize(self):
         super(MultiLine, self).resize()
         self.make_contained_widgets()
@@ -181,12 +202,12 @@ object to be passed to the contained widget."""
         no_change = False
         try:            
             if (self._safe_to_display_cache and \
-                self._last_value is self.value) and \
-                (self.values == self._last_values) and \
+                unchanged(self._last_value, self.value)) and \
+                unchanged(self._last_values, self.values) and \
                 (self.start_display_at == self._last_start_display_at) and \
                 (clear != True) and \
                 (self._last_cursor_line == self.cursor_line) and \
-                (self._last_filter == self._filter) and \
+                (self._last_displayed_filter == self._filter) and \
                 self.editing:
                 no_change = True
        
@@ -254,8 +275,9 @@ object to be passed to the contained widget."""
 
         self._last_start_display_at = self.start_display_at
         self._last_cursor_line = self.cursor_line
-        self._last_values = copy.copy(self.values)
-        self._last_value  = copy.copy(self.value)
+        self._last_values = snapshot(self.values)
+        self._last_value  = snapshot(self.value)
+        self._last_displayed_filter = self._filter
         
         # This will prevent the program crashing if the user has changed values, and the cursor 
         # is now on the bottom line.
@@ -320,22 +342,32 @@ object to be passed to the contained widget."""
         line.highlight = value
 
     def get_filtered_indexes(self, force_remake_cache=False):
+        """Return the indexes of the values matching the filter.  When the filter only grew
+        since the last call and the values are the same, only the last matches are tested
+        again, so filter_value must not match more lines for a longer filter."""
+        narrow = False
         if not force_remake_cache:
             try:
-                if self._last_filter == self._filter and self._last_values == self.values:
-                    return self._filtered_values_cache
+                if unchanged(self._last_filtered_values, self.values):
+                    if self._last_filter == self._filter:
+                        return self._last_filtered_indexes
+                    narrow = bool(self._last_filter) and bool(self._filter) and \
+                        self._last_filter in self._filter
             except ReferenceError:
                 # Can happen if self.values was a list of weak references
                 pass
         
-        self._last_filter = self._filter
-        self._last_values = copy.copy(self.values)
         if self._filter == None or self._filter == '':
-            return []
-        list_of_indexes = []
-        for indexer in range(len(self.values)):
-            if self.filter_value(indexer):
-                list_of_indexes.append(indexer)
+            list_of_indexes = []
+        elif narrow:
+            list_of_indexes = [indexer for indexer in self._last_filtered_indexes
+                                    if self.filter_value(indexer)]
+        else:
+            list_of_indexes = [indexer for indexer in range(len(self.values))
+                                    if self.filter_value(indexer)]
+        self._last_filter = self._filter
+        self._last_filtered_values = snapshot(self.values)
+        self._last_filtered_indexes = list_of_indexes
         return list_of_indexes
     
     def get_filtered_values(self):
@@ -348,8 +380,22 @@ object to be passed to the contained widget."""
         self._filtered_values_cache = self.get_filtered_indexes(force_remake_cache=True)
         
 
+    def _display_string(self, index):
+        """Return display_value() of a value, cached until the values are changed."""
+        values = self.values
+        if not (self._safe_to_display_cache and isinstance(values, VersionedList)):
+            return self.display_value(values[index])
+        if not unchanged(self._display_strings_stamp, values):
+            self._display_strings = {}
+            self._display_strings_stamp = snapshot(values)
+        try:
+            return self._display_strings[index]
+        except KeyError:
+            string = self._display_strings[index] = self.display_value(values[index])
+            return string
+
     def filter_value(self, index):
-        if self._filter in self.display_value(self.values[index]):
+        if self._filter in self._display_string(index):
             return True
         else:
             return False
@@ -177,6 +177,7 @@ class TreeLineAnnotated(TreeLine):
 
 class MLTree(multiline.MultiLine):
     # Experimental
+    _safe_to_display_cache = False # Nodes are expanded and collapsed in place
     
     #_contained_widgets = TreeLineAnnotated
     _contained_widgets = TreeLine
@@ -0,0 +1,89 @@
+#!/usr/bin/python
+"""List widgets for values in the thousands, such as every VF of a multi-port card or
+every path of a multipath disk.
+
+Like MultiLine they draw through one row widget per visible line, but a row is checked
+against sets of the filtered and selected indexes instead of lists, and the display
+strings are cached, so drawing and scrolling cost the same for ten values as for ten
+thousand."""
+from . import wgmultiline   as multiline
+from . import wgselectone   as selectone
+from . import wgmultiselect as multiselect
+
+
+class _VirtualRows(object):
+    def _filtered_index_set(self):
+        # _filtered_values_cache is replaced, never changed in place, whenever the
+        # filter or the values change
+        cache = self._filtered_values_cache
+        if self.__dict__.get('_filtered_set_source') is not cache:
+            self._filtered_set_source = cache
+            self._filtered_set = frozenset(cache)
+        return self._filtered_set
+
+    def update(self, clear=True):
+        value = self.value
+        if value is None:
+            self._selected_set = frozenset()
+        elif hasattr(value, '__iter__') and not isinstance(value, str):
+            self._selected_set = frozenset(value)
+        else:
+            self._selected_set = frozenset((value,))
+        return super(_VirtualRows, self).update(clear=clear)
+
+    def _set_line_values(self, line, value_indexer):
+        try:
+            line.value = self._display_string(value_indexer)
+        except (IndexError, TypeError):
+            self._set_line_blank(line)
+            return False
+        line.hidden = False
+
+    def _set_line_highlighting(self, line, value_indexer):
+        self.set_is_line_important(line, value_indexer in self._filtered_index_set())
+        self.set_is_line_bold(line, value_indexer in self._selected_set)
+        self.set_is_line_cursor(line, False)
+
+
+class _VirtualSelectRows(_VirtualRows):
+    def _print_line(self, line, value_indexer):
+        try:
+            display_this = self._display_string(value_indexer)
+            line.value = display_this
+            line.hide = False
+            selected = value_indexer in self._selected_set
+            if hasattr(line, 'selected'):
+                line.selected = selected
+            # Most classes in the standard library use this
+            else:
+                line.show_bold = selected
+                line.name = display_this
+                line.value = selected
+            line.important = value_indexer in self._filtered_index_set()
+        except IndexError:
+            line.name = None
+            line.hide = True
+
+        line.highlight= False
+
+
+class VirtualMultiLine(_VirtualRows, multiline.MultiLine):
+    pass
+
+class VirtualSelectOne(_VirtualSelectRows, selectone.SelectOne):
+    pass
+
+class VirtualMultiSelect(_VirtualSelectRows, multiselect.MultiSelect):
+    def h_set_filtered_to_selected(self, ch):
+        # A copy, or selecting more lines would change the filter matches too
+        self.value = list(self._filtered_values_cache)
+
+
+class TitleVirtualMultiLine(multiline.TitleMultiLine):
+    _entry_type = VirtualMultiLine
+
+class TitleVirtualSelectOne(multiline.TitleMultiLine):
+    _entry_type = VirtualSelectOne
+
+class TitleVirtualMultiSelect(multiline.TitleMultiLine):
+    _entry_type = VirtualMultiSelect
@@ -8,6 +8,7 @@ import curses.ascii
 import weakref
 from . import npysGlobalOptions as GlobalOptions
 from . import wgwidget_proto
+from .npysVersionedList import snapshot, unchanged
 import locale
 import warnings
 
@@ -51,6 +52,22 @@ def add_test_input_ch(test_input):
     TEST_SETTINGS['TEST_INPUT'].append(test_input)
     
 
+# Values a widget may hold that cannot change without being reassigned
+try:
+    _IMMUTABLE_VALUES = (bool, int, long, float, str, unicode, tuple)
+except NameError:
+    _IMMUTABLE_VALUES = (bool, int, float, str, bytes, tuple)
+# Never equal to a value, so the widget is always redrawn
+_ALWAYS_REDRAW = object()
+
+def _display_state(value):
+    """Return what Widget.needs_display() compares a value or values with."""
+    if value is None or isinstance(value, _IMMUTABLE_VALUES):
+        return value
+    if isinstance(value, list):
+        return snapshot(value)
+    return _ALWAYS_REDRAW
+
 class ExhaustedTestInput(Exception):
     pass
 
@@ -195,6 +212,15 @@ class Widget(InputHandler, wgwidget_proto._LinePrinter, EventHandler):
     "A base class for widgets. Do not use directly"
     
     _SAFE_STRING_STRIPS_NL = True
+    # False for widgets whose values change in ways needs_display() cannot
+    # see, such as grids of lists or trees.  They are redrawn every time.
+    _safe_to_display_cache = True
+    
+    def __setattr__(self, name, value):
+        # Any attribute may change how the widget looks: focus, colour,
+        # hidden, cursor position...
+        self.__dict__['_display_dirty'] = True
+        super(Widget, self).__setattr__(name, value)
     
     def destroy(self):
         """Destroy the widget: methods should provide a mechanism to destroy any references that might
@@ -428,6 +454,35 @@ big a given widget is ... use .height and .width instead"""
         else:
             self.update()
             self.parent.refresh()
+        self.mark_displayed()
+
+    def _display_children(self):
+        """The widgets this one is drawn with, such as the entry widget of Title widgets."""
+        return [child for child in (self.__dict__.get('label_widget'), self.__dict__.get('entry_widget'))
+                    if isinstance(child, Widget)]
+
+    def needs_display(self):
+        """Return True if the widget may look different from when it was last drawn: an
+        attribute was set, or its value or values changed in place, since mark_displayed()."""
+        state = self.__dict__
+        if state.get('_display_dirty', True) or not self._safe_to_display_cache:
+            return True
+        if not unchanged(state['_displayed_value'], getattr(self, 'value', None)) or \
+                not unchanged(state['_displayed_values'], getattr(self, 'values', None)):
+            return True
+        for child in self._display_children():
+            if child.needs_display():
+                return True
+        return False
+
+    def mark_displayed(self):
+        """Record that the widget is on screen as it is now."""
+        state = self.__dict__
+        state['_display_dirty']   = False
+        state['_displayed_value'] = _display_state(getattr(self, 'value', None))
+        state['_displayed_values']= _display_state(getattr(self, 'values', None))
+        for child in self._display_children():
+            child.mark_displayed()
 
     def set_editable(self, value):
         if value: self._is_editable = True
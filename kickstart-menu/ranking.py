@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""Rank the NICs found by hardware.scan_nics() for each network role.
+
+The PXE and cluster networks want ports with a link, no SR-IOV and, for a
+team, members of the same speed: LACP spreads flows over every member, so
+a 1G port teamed with a 10G one caps the flows hashed to it at 1G. SR-IOV
+capable ports are kept for the sensor networks, which rank them first.
+"""
+
+ROLES = ('pxe', 'cluster', 'sensor')
+
+
+def _speed(nic):
+    """Return the link speed in Mb/s, 0 if unknown."""
+    return nic.speed or 0
+
+
+def _sriov(nic):
+    """Return True if virtual functions can be created on the port."""
+    return bool(nic.sriov_totalvfs)
+
+
+def _key(nic, role, taken, numa_node):
+    """Sort key of a NIC for a role, best first."""
+    sensor = role == 'sensor'
+    return (nic.name in taken,
+            nic.operstate != 'up',
+            # A VF disappears with its physical function's configuration
+            nic.virtual_function,
+            _sriov(nic) != sensor,
+            -_speed(nic),
+            numa_node is not None and nic.numa_node != numa_node,
+            nic.name)
+
+
+def rank(nics, role, taken=(), numa_node=None):
+    """Return the interface names ordered from best to worst for a role.
+
+    nics: dict of name to hardware.Nic
+    taken: names already used by another network, ranked last
+    numa_node: prefer ports attached to this NUMA node
+    """
+    if role not in ROLES:
+        raise ValueError('Unknown network role %r' % role)
+    taken = set(taken)
+    return [nic.name for nic in
+            sorted(nics.values(),
+                   key=lambda nic: _key(nic, role, taken, numa_node))]
+
+
+def preselect(nics, role, taken=()):
+    """Return the names to select for a role before the user picks any.
+
+    PXE and sensor networks get the best port. The cluster network gets
+    the best port and every free port with a link at the same speed on the
+    same NUMA node, to be teamed. Nothing is selected without a link.
+    """
+    ranked = rank(nics, role, taken)
+    if not ranked:
+        return []
+    best = nics[ranked[0]]
+    if best.operstate != 'up' or best.name in taken:
+        return []
+    if role != 'cluster':
+        return [best.name]
+    members = [best.name]
+    for name in ranked[1:]:
+        nic = nics[name]
+        if name in taken or nic.operstate != 'up' or \
+                nic.virtual_function or _sriov(nic) or \
+                _speed(nic) != _speed(best) or \
+                nic.numa_node != best.numa_node:
+            continue
+        members.append(name)
+    return members
+
+
+def team_warnings(nics, names):
+    """Return what is wrong with teaming the named interfaces.
+
+    Return: list of one-line messages, empty if the team looks right
+    """
+    members = [nics[name] for name in names if name in nics]
+    warnings = []
+    for name in names:
+        if name not in nics:
+            warnings.append('%s is missing' % name)
+    for nic in members:
+        if nic.operstate != 'up':
+            warnings.append('%s has no link (%s)' % (nic.name, nic.operstate))
+        if _sriov(nic):
+            warnings.append('%s supports SR-IOV and is better used for a '
+                            'sensor network' % nic.name)
+    speeds = set(_speed(nic) for nic in members if _speed(nic))
+    if len(speeds) > 1:
+        slowest = min(speeds)
+        warnings.append('Mixed speeds: flows over %s are limited to %d '
+                        'Mb/s' %
+                        (', '.join(nic.name for nic in members
+                                   if _speed(nic) == slowest), slowest))
+    numa_nodes = set(nic.numa_node for nic in members
+                     if nic.numa_node is not None)
+    if len(numa_nodes) > 1:
+        warnings.append('Members are on different NUMA nodes (%s)' %
+                        ', '.join(str(node) for node in sorted(numa_nodes)))
+    return warnings
+
+
+def describe(nic):
+    """Return the state of a NIC for an interface list label."""
+    parts = [nic.operstate]
+    if nic.speed:
+        parts.append('%d Mb/s' % nic.speed)
+    if nic.virtual_function:
+        parts.append('VF')
+    elif _sriov(nic):
+        parts.append('SR-IOV')
+    if nic.numa_node is not None:
+        parts.append('NUMA %d' % nic.numa_node)
+    return ', '.join(parts)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+"""Replace <insert-...> placeholders in files in a single pass.
+
+Every file is read once, all placeholders are replaced with one regular
+expression pass and the result is renamed into place, so a file is never
+left half substituted. Placeholders that had no value are reported.
+
+    substitute.py --vars /EDCOP/vars -m master-ip=PXEIP -m drive=DRIVE \\
+        /EDCOP/pxe/deploy/ks/minion/main.ks
+"""
+from __future__ import print_function
+import argparse
+import io
+import os
+import re
+import sys
+import writer
+
+PLACEHOLDER = re.compile(r'<insert-([A-Za-z0-9_-]+)>')
+VARS_FILE = '/EDCOP/vars'
+
+
+def load_vars(path):
+    """Return the KEY=VALUE assignments of a shell variables file."""
+    values = {}
+    with io.open(path, encoding='utf-8') as variables:
+        for line in variables:
+            line = line.strip()
+            if line.startswith('export '):
+                line = line[len('export '):].lstrip()
+            if not line or line.startswith('#') or '=' not in line:
+                continue
+            key, value = line.split('=', 1)
+            if len(value) > 1 and value[0] == value[-1] and value[0] in '"\'':
+                value = value[1:-1]
+            values[key.strip()] = value
+    return values
+
+
+class Substitution(object):
+    """Placeholder values and the placeholders found without one."""
+
+    def __init__(self, values, keep=()):
+        """Init.
+
+        values: placeholder name (without "<insert-" and ">") to text
+        keep: placeholders expected to stay, e.g. filled in by a later step
+        """
+        self.values = values
+        self.keep = set(keep)
+        self.missing = {}
+
+    def apply(self, text, name=None):
+        """Return text with every known placeholder replaced."""
+        def replace(match):
+            value = self.values.get(match.group(1))
+            if value is None:
+                if match.group(1) not in self.keep:
+                    self.missing.setdefault(name, set()).add(match.group(0))
+                return match.group(0)
+            return value
+        return PLACEHOLDER.sub(replace, text)
+
+    def files(self, paths):
+        """Substitute files in place.
+
+        Symbolic links are followed. Files of one directory are renamed
+        into place together, and a SHA256SUMS manifest listing a file is
+        updated with it.
+        Return: number of files changed
+        """
+        directories = {}
+        for path in paths:
+            real = os.path.realpath(path)
+            directories.setdefault(os.path.dirname(real), []).append(
+                (path, real))
+
+        changed = 0
+        for directory, files in sorted(directories.items()):
+            output = writer.OutputWriter(directory)
+            try:
+                for path, real in files:
+                    with io.open(real, encoding='utf-8',
+                                 newline='') as source:
+                        text = source.read()
+                    result = self.apply(text, path)
+                    if result == text:
+                        continue
+                    name = os.path.basename(real)
+                    with output.open(name,
+                                     checksum=output.digest(name) is not None,
+                                     mode=os.stat(real).st_mode & 0o7777) \
+                            as target:
+                        target.write(result)
+                    changed += 1
+                output.commit()
+            except:
+                output.abort()
+                raise
+        return changed
+
+
+def _assignments(arguments, option):
+    """Split NAME=VALUE command line arguments."""
+    pairs = {}
+    for argument in arguments:
+        if '=' not in argument:
+            raise ValueError('%s expects NAME=VALUE, got %r' %
+                             (option, argument))
+        name, value = argument.split('=', 1)
+        pairs[name] = value
+    return pairs
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(
+        description='Replace <insert-NAME> placeholders in files.')
+    parser.add_argument('files', nargs='+', help='files to substitute')
+    parser.add_argument('--vars', default=VARS_FILE,
+                        help='shell variables file (default: %(default)s)')
+    parser.add_argument('-m', '--map', action='append', default=[],
+                        metavar='NAME=VAR',
+                        help='replace <insert-NAME> with variable VAR')
+    parser.add_argument('-d', '--define', action='append', default=[],
+                        metavar='NAME=VALUE',
+                        help='replace <insert-NAME> with VALUE')
+    parser.add_argument('-k', '--keep', action='append', default=[],
+                        metavar='NAME',
+                        help='do not report <insert-NAME> if it is left')
+    parser.add_argument('--strict', action='store_true',
+                        help='exit with status 2 if placeholders are left')
+    args = parser.parse_args(argv)
+
+    try:
+        mapping = _assignments(args.map, '--map')
+        values = _assignments(args.define, '--define')
+        if mapping:
+            variables = load_vars(args.vars)
+            for name, variable in mapping.items():
+                if variable not in variables:
+                    raise ValueError('%s is not set in %s' %
+                                     (variable, args.vars))
+                values.setdefault(name, variables[variable])
+    except (IOError, OSError, ValueError) as error:
+        print('substitute: %s' % error, file=sys.stderr)
+        return 1
+
+    substitution = Substitution(values, args.keep)
+    substitution.files(args.files)
+    for path in sorted(substitution.missing):
+        print('substitute: %s: left %s' %
+              (path, ' '.join(sorted(substitution.missing[path]))),
+              file=sys.stderr)
+    if args.strict and substitution.missing:
+        return 2
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+"""Persistent bytecode cache and compiled modules for the kickstart templates."""
+import json
+import os
+from hashlib import sha1
+from jinja2.bccache import FileSystemBytecodeCache
+from jinja2.exceptions import TemplateNotFound
+from jinja2.loaders import ModuleLoader
+
+# Written next to the compiled modules, maps template names to source checksums
+CHECKSUM_FILE = 'checksums.json'
+
+
+class ChecksumBytecodeCache(FileSystemBytecodeCache):
+    """FileSystemBytecodeCache keyed by template name and source checksum.
+
+    The stock cache keys buckets by the template's absolute filename, which
+    differs between the ISO build tree and /run/install/repo. Keying by the
+    source checksum lets a cache filled at build time be used by anaconda,
+    and an edited template simply misses the cache.
+    """
+
+    def __init__(self, directory, readonly=False):
+        """Init."""
+        super(ChecksumBytecodeCache, self).__init__(directory, '%s.cache')
+        self.readonly = readonly
+
+    def get_bucket(self, environment, name, filename, source):
+        """Return the cache bucket for the given template source."""
+        checksum = self.get_source_checksum(source)
+        # The code compiled from a source also depends on these options
+        if environment.keep_trailing_newline:
+            checksum += '|nl'
+        return super(ChecksumBytecodeCache, self).get_bucket(
+            environment, name + '|' + checksum, None, source)
+
+    def dump_bytecode(self, bucket):
+        """Write bytecode unless the cache is read-only."""
+        if self.readonly:
+            return
+        try:
+            super(ChecksumBytecodeCache, self).dump_bytecode(bucket)
+        except (IOError, OSError):
+            # A cache that cannot be written must never break rendering
+            pass
+
+
+def open_cache(directory):
+    """Return a cache for directory, or None if there is nothing to use.
+
+    The directory is created when possible. If it exists but cannot be
+    written (e.g. on the installation media) the cache is used read-only.
+    """
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            return None
+    return ChecksumBytecodeCache(directory,
+                                 readonly=not os.access(directory, os.W_OK))
+
+
+def source_checksum(source):
+    """Return the checksum of a template source (as the bytecode cache does)."""
+    return sha1(source.encode('utf-8')).hexdigest()
+
+
+def write_checksums(directory, environment, names):
+    """Record the source checksum of each template compiled into directory."""
+    checksums = {}
+    for name in names:
+        source = environment.loader.get_source(environment, name)[0]
+        checksums[name] = source_checksum(source)
+    with open(os.path.join(directory, CHECKSUM_FILE), 'w') as checksum_file:
+        json.dump(checksums, checksum_file, indent=2, sort_keys=True)
+
+
+class ChecksumModuleLoader(ModuleLoader):
+    """ModuleLoader that ignores modules compiled from an older source.
+
+    A template whose source differs from the one it was compiled from, or
+    that was compiled without a recorded checksum, is reported missing so a
+    ChoiceLoader falls through to source_loader. Without a source tree the
+    compiled modules are used as they are.
+    """
+
+    def __init__(self, path, source_loader):
+        """Init."""
+        super(ChecksumModuleLoader, self).__init__(path)
+        self.source_loader = source_loader
+        try:
+            with open(os.path.join(path, CHECKSUM_FILE)) as checksum_file:
+                self.checksums = json.load(checksum_file)
+        except (IOError, OSError, ValueError):
+            self.checksums = {}
+
+    def load(self, environment, name, globals=None):
+        """Load the compiled module for name if it matches the source."""
+        try:
+            source = self.source_loader.get_source(environment, name)[0]
+        except TemplateNotFound:
+            source = None
+        if (source is not None and
+                self.checksums.get(name) != source_checksum(source)):
+            raise TemplateNotFound(name)
+        return super(ChecksumModuleLoader, self).load(environment, name,
+                                                      globals)
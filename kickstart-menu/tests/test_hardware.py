@@ -0,0 +1,105 @@
+"""Tests of the sysfs disk and NIC discovery against a fixture tree.
+
+fixtures/sysfs holds the entries hardware.py reads, with the symlinks of
+a real /sys: an SSD with a partition, a SAS HDD, an NVMe disk, an empty
+card reader, a USB stick, a disk without a size, loop and device mapper
+devices, and an onboard NIC next to an SR-IOV port and one of its VFs.
+"""
+import os
+import unittest
+import hardware
+
+SYSFS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                     'fixtures', 'sysfs')
+
+
+class DiskTest(unittest.TestCase):
+    """scan_disks() and read_disk()."""
+
+    def setUp(self):
+        disks, self.unreadable = hardware.scan_disks(SYSFS)
+        self.disks = dict((disk.name, disk) for disk in disks)
+
+    def test_whole_disks_only(self):
+        # No partitions, loop or device mapper devices, no empty readers
+        self.assertEqual(sorted(self.disks), ['nvme0n1', 'sda', 'sdb', 'sdd'])
+
+    def test_unreadable(self):
+        self.assertEqual(self.unreadable, ['sde'])
+        self.assertRaises(IOError, hardware.read_disk, 'sde', SYSFS)
+
+    def test_size(self):
+        # 512 byte sectors, in MiB
+        self.assertEqual(self.disks['sdd'].size, 14664.0)
+        self.assertEqual(self.disks['sda'].size,
+                         1000215216 * 512 / 1048576.0)
+
+    def test_rotational(self):
+        self.assertIs(self.disks['sda'].rotational, False)
+        self.assertIs(self.disks['sdb'].rotational, True)
+
+    def test_removable(self):
+        self.assertIs(self.disks['sdd'].removable, True)
+        self.assertIs(self.disks['sda'].removable, False)
+
+    def test_transport(self):
+        self.assertEqual(dict((name, disk.transport)
+                              for name, disk in self.disks.items()),
+                         {'nvme0n1': 'nvme', 'sda': 'sata', 'sdb': 'scsi',
+                          'sdd': 'usb'})
+
+    def test_model_and_serial(self):
+        # The ATA vendor is dropped, others are prefixed
+        self.assertEqual(self.disks['sda'].model, 'Samsung SSD 860')
+        self.assertEqual(self.disks['sdb'].model, 'SEAGATE ST4000NM0025')
+        # From the VPD page of SCSI disks, the attribute of NVMe ones
+        self.assertEqual(self.disks['sda'].serial, 'S3Z9NB0K123456')
+        self.assertEqual(self.disks['nvme0n1'].serial, 'PHLJ9123000X1P0FGN')
+        self.assertIsNone(self.disks['sdb'].serial)
+
+    def test_numa_node(self):
+        self.assertEqual(self.disks['sda'].numa_node, 0)
+        self.assertEqual(self.disks['nvme0n1'].numa_node, 1)
+        self.assertIsNone(self.disks['sdd'].numa_node)
+
+    def test_no_sysfs(self):
+        self.assertIsNone(hardware.scan_disks(os.path.join(SYSFS, 'none')))
+
+
+class NicTest(unittest.TestCase):
+    """scan_nics() and read_nic()."""
+
+    def setUp(self):
+        self.nics = hardware.scan_nics(sysfs_root=SYSFS)
+
+    def test_all_but_lo(self):
+        self.assertEqual(sorted(self.nics), ['eno1', 'ens1f0', 'ens1f0v0'])
+
+    def test_named(self):
+        self.assertEqual(sorted(hardware.scan_nics(['ens1f0', 'eth9'],
+                                                   SYSFS)), ['ens1f0'])
+
+    def test_link_up(self):
+        nic = self.nics['eno1']
+        self.assertEqual((nic.operstate, nic.speed, nic.duplex),
+                         ('up', 1000, 'full'))
+        self.assertEqual(nic.driver, 'e1000e')
+        self.assertEqual(nic.mac, '3c:fd:fe:00:00:01')
+        # numa_node -1: no affinity
+        self.assertIsNone(nic.numa_node)
+
+    def test_link_down(self):
+        nic = self.nics['ens1f0']
+        self.assertEqual(nic.operstate, 'down')
+        self.assertIsNone(nic.speed)
+
+    def test_sriov(self):
+        self.assertEqual(self.nics['ens1f0'].sriov_totalvfs, 63)
+        self.assertEqual(self.nics['ens1f0'].numa_node, 1)
+        self.assertIs(self.nics['ens1f0'].virtual_function, False)
+        self.assertIs(self.nics['ens1f0v0'].virtual_function, True)
+        self.assertIsNone(self.nics['ens1f0v0'].sriov_totalvfs)
+
+
+if __name__ == '__main__':
+    unittest.main()
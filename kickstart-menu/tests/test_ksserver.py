@@ -0,0 +1,118 @@
+"""Tests of the minion kickstart server, through a local HTTP client."""
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+try:
+    from urllib2 import HTTPError, Request, urlopen
+except ImportError:
+    from urllib.error import HTTPError
+    from urllib.request import Request, urlopen
+import ksserver
+
+NODES = [
+    {'hostname': 'sensor1', 'mac': 'AA:BB:CC:DD:EE:01',
+     'pxe_interface': 'eno2', 'pxe_ip': '10.50.50.21',
+     'cluster_interfaces': 'eno1', 'os_disk': 'sda', 'bulk_disk': 'sdb'},
+    {'hostname': 'sensor2', 'mac': 'aa:bb:cc:dd:ee:02',
+     'pxe_interface': 'eno2', 'cluster_interfaces': 'eno1',
+     'os_disk': 'nvme0n1'},
+]
+
+
+class KickstartServerTest(unittest.TestCase):
+    """Serve an inventory of two nodes on an ephemeral port."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        inventory_file = os.path.join(self.directory, 'inventory.json')
+        with open(inventory_file, 'w') as nodes:
+            json.dump(NODES, nodes)
+        vars_file = os.path.join(self.directory, 'vars')
+        with open(vars_file, 'w') as variables:
+            variables.write('PXEIP=10.50.50.1\nTOKEN=abc.123\n')
+        # No static kickstarts: unknown clients get 404
+        self.server = ksserver.KickstartServer(
+            ('127.0.0.1', 0), inventory_file, vars_file,
+            os.path.join(self.directory, 'static'))
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+
+    def get(self, path, headers=None):
+        """Return the body of a GET request."""
+        url = 'http://127.0.0.1:%d%s' % (self.server.server_address[1], path)
+        response = urlopen(Request(url, headers=headers or {}))
+        try:
+            return response.read().decode('utf-8')
+        finally:
+            response.close()
+
+    def assertNotFound(self, path, headers=None):
+        try:
+            self.get(path, headers)
+        except HTTPError as error:
+            self.assertEqual(error.code, 404)
+        else:
+            self.fail(path + ' was found')
+
+    def test_profile(self):
+        body = self.get('/deploy/ks/minion/main.ks?profile=sensor1')
+        self.assertIn('--hostname=sensor1', body)
+        self.assertIn('--boot-drive=sda', body)
+
+    def test_mac(self):
+        body = self.get('/deploy/ks/minion/main.ks', {
+            'X-RHN-Provisioning-MAC-0': 'eth0 aa:bb:cc:dd:ee:09',
+            'X-RHN-Provisioning-MAC-1': 'eth1 AA:BB:CC:DD:EE:02'})
+        self.assertIn('--hostname=sensor2', body)
+
+    def test_address(self):
+        body = self.get('/deploy/ks/minion/main.ks',
+                        {'X-Real-IP': '10.50.50.21'})
+        self.assertIn('--hostname=sensor1', body)
+
+    def test_default_address(self):
+        # sensor2 has the default PXE address, it is nobody's
+        self.assertNotFound('/deploy/ks/minion/main.ks',
+                            {'X-Real-IP': '10.50.50.1'})
+
+    def test_unknown(self):
+        self.assertNotFound('/deploy/ks/minion/main.ks?profile=sensor9')
+        self.assertNotFound('/deploy/ks/minion/other.ks?profile=sensor1')
+
+    def test_placeholders(self):
+        body = self.get('/deploy/ks/minion/main.ks?profile=sensor1')
+        self.assertIn('http://10.50.50.1:5415/', body)
+        self.assertNotIn('<insert-master-ip>', body)
+
+    def test_cache(self):
+        first = self.get('/deploy/ks/minion/storage.ks?profile=sensor1')
+        second = self.get('/deploy/ks/minion/storage.ks?profile=sensor1')
+        self.assertEqual(first, second)
+        self.assertEqual(self.server.cache.renders, 1)
+
+    def test_one_bootloader(self):
+        # The bootloader line comes from main.ks, directly or through
+        # /tmp/pre-bootloader, never from storage.ks
+        for profile in ('sensor1', 'sensor2'):
+            main = self.get('/deploy/ks/minion/main.ks?profile=' + profile)
+            storage = self.get('/deploy/ks/minion/storage.ks?profile=' +
+                               profile)
+            lines = main.splitlines() + storage.splitlines()
+            self.assertEqual(
+                len([line for line in lines
+                     if line.startswith('bootloader') or
+                     line == '%include /tmp/pre-bootloader']), 1)
+            self.assertIn('clearpart', storage)
+
+
+if __name__ == '__main__':
+    unittest.main()
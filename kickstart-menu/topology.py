@@ -0,0 +1,326 @@
+#!/usr/bin/env python
+"""Plan sensor, IRQ and housekeeping cores from the CPU and NUMA layout.
+
+Sensors get isolated cores on the NUMA node of their NICs, with one core of
+that node left to handle the NICs' interrupts and every other core doing
+housekeeping, as described in docs/optimization_guide.rst.
+
+Run on a node, this prints its layout as the ``topology`` field of an
+inventory record, with the kernel arguments it leads to:
+
+    python topology.py -s enp216s0f2 -s enp216s0f3
+
+With --cores it only prints the kernel arguments isolating the sensor
+cores, which the minion kickstart uses for nodes without a layout in the
+inventory.
+"""
+from __future__ import print_function
+import argparse
+import glob
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import namedtuple
+import hardware
+
+PROC_MEMINFO = '/proc/meminfo'
+# Physical cores of each sensor node kept for housekeeping when every node
+# has a sensor NIC
+HOUSEKEEPING_CORES = 1
+
+
+def parse_cpulist(text):
+    """Return the CPUs of a kernel CPU list such as "0-7,16-23"."""
+    cpus = set()
+    for part in (text or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            first, last = part.split('-', 1)
+            cpus.update(range(int(first), int(last) + 1))
+        else:
+            cpus.add(int(part))
+    return sorted(cpus)
+
+
+def _cpulist(path):
+    """Return the CPUs of a CPU list attribute, empty if unreadable."""
+    try:
+        with open(path) as attribute:
+            return parse_cpulist(attribute.read())
+    except (IOError, OSError, ValueError):
+        return []
+
+
+def _memory(path):
+    """Return the MemTotal of a meminfo file in MiB, or None."""
+    try:
+        with open(path) as meminfo:
+            for line in meminfo:
+                # "MemTotal: 16314852 kB", prefixed by "Node 0 " per node
+                fields = line.split()
+                if 'MemTotal:' in fields:
+                    return int(fields[fields.index('MemTotal:') + 1]) // 1024
+    except (IOError, OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def max_channels(name):
+    """Return the most combined queues ethtool reports for a NIC, or None.
+
+    None as well if ethtool is missing or the driver cannot tell.
+    """
+    try:
+        process = subprocess.Popen(['ethtool', '-l', name],
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE)
+        output = process.communicate()[0].decode('ascii', 'replace')
+    except OSError:
+        return None
+    # "Pre-set maximums:" comes before "Current hardware settings:"
+    for line in output.split('Current')[0].splitlines():
+        fields = line.split()
+        if fields[:1] == ['Combined:'] and fields[1:2] and \
+                fields[1].isdigit():
+            return int(fields[1]) or None
+    return None
+
+
+def format_cpulist(cpus):
+    """Return the kernel CPU list of some CPUs, with ranges collapsed."""
+    ranges = []
+    for cpu in sorted(set(cpus)):
+        if ranges and ranges[-1][1] == cpu - 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ','.join(str(first) if first == last else '%d-%d' % (first, last)
+                    for first, last in ranges)
+
+
+class CorePlan(namedtuple('CorePlan', ('isolated', 'irq', 'housekeeping'))):
+    """CPUs for the sensors, for the sensor NICs' interrupts and the rest."""
+
+    __slots__ = ()
+
+    def kernel_args(self):
+        """Return the kernel arguments enforcing the plan."""
+        return ['isolcpus=' + format_cpulist(self.isolated + self.irq),
+                'nohz_full=' + format_cpulist(self.isolated),
+                'rcu_nocbs=' + format_cpulist(self.isolated),
+                'irqaffinity=' + format_cpulist(self.housekeeping)]
+
+
+class Topology(object):
+    """CPUs by NUMA node and physical core, the NICs' NUMA nodes and the
+    memory of each NUMA node.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, nodes, cores=None, nics=None, sriov=(), memory=None,
+                 gigantic=False, drivers=None, channels=None):
+        """Init.
+
+        nodes: dict of NUMA node to its CPUs
+        cores: lists of the hardware threads of each physical core; every
+            CPU is its own core if None
+        nics: dict of interface name to NUMA node (None if unknown)
+        sriov: names of the SR-IOV capable interfaces
+        memory: dict of NUMA node to its memory in MiB, None if unknown
+        gigantic: True if the CPU supports 1G hugepages
+        drivers: dict of interface name to its driver, for physical NICs
+        channels: dict of interface name to its most combined queues
+        """
+        self.nodes = dict((int(node), sorted(cpus))
+                          for node, cpus in nodes.items())
+        cpus = sorted(cpu for node in self.nodes.values() for cpu in node)
+        if cores is None:
+            cores = [[cpu] for cpu in cpus]
+        self.cores = sorted(sorted(core) for core in cores
+                            if set(core) <= set(cpus))
+        self.nics = dict(nics or {})
+        self.sriov = sorted(sriov)
+        self.memory = None if memory is None else \
+            dict((int(node), size) for node, size in memory.items())
+        self.gigantic = gigantic
+        self.drivers = dict(drivers or {})
+        self.channels = dict(channels or {})
+
+    @classmethod
+    def from_sysfs(cls, sysfs_root=hardware.SYSFS_ROOT,
+                   meminfo=PROC_MEMINFO, probe_channels=True):
+        """Read the layout of the running system.
+
+        probe_channels: ask ethtool for the queues of the physical NICs
+        """
+        system = os.path.join(sysfs_root, 'devices', 'system')
+        nodes, memory = {}, {}
+        for path in glob.glob(os.path.join(system, 'node', 'node[0-9]*')):
+            node = int(re.sub(r'\D', '', os.path.basename(path)))
+            cpus = _cpulist(os.path.join(path, 'cpulist'))
+            if cpus:
+                nodes[node] = cpus
+            size = _memory(os.path.join(path, 'meminfo'))
+            if size:
+                memory[node] = size
+        if not nodes:
+            # No NUMA support: a single node with every online CPU
+            nodes[0] = _cpulist(os.path.join(system, 'cpu', 'online'))
+        if not memory:
+            size = _memory(meminfo)
+            if size:
+                memory[0] = size
+        cores = set()
+        for cpus in nodes.values():
+            for cpu in cpus:
+                siblings = _cpulist(os.path.join(
+                    system, 'cpu', 'cpu%d' % cpu, 'topology',
+                    'thread_siblings_list')) or [cpu]
+                cores.add(tuple(siblings))
+        nics = hardware.scan_nics(sysfs_root=sysfs_root)
+        drivers = dict((name, nic.driver) for name, nic in nics.items()
+                       if nic.driver and not nic.virtual_function)
+        channels = {}
+        if probe_channels:
+            for name in drivers:
+                channels[name] = max_channels(name)
+        return cls(nodes, [list(core) for core in cores],
+                   dict((name, nic.numa_node) for name, nic in nics.items()),
+                   [name for name, nic in nics.items()
+                    if nic.sriov_totalvfs and not nic.virtual_function],
+                   memory or None,
+                   os.path.isdir(os.path.join(sysfs_root, 'kernel', 'mm',
+                                              'hugepages',
+                                              'hugepages-1048576kB')),
+                   drivers, channels)
+
+    @classmethod
+    def from_record(cls, record):
+        """Return the layout saved by to_record()."""
+        cores = record.get('cores')
+        return cls(dict((node, parse_cpulist(cpus))
+                        for node, cpus in record['nodes'].items()),
+                   None if cores is None else
+                   [parse_cpulist(core) for core in cores],
+                   record.get('nics'), record.get('sriov', ()),
+                   record.get('memory'), record.get('gigantic', False),
+                   record.get('drivers'), record.get('channels'))
+
+    def to_record(self):
+        """Return the layout as an inventory ``topology`` field."""
+        return {'nodes': dict((str(node), format_cpulist(cpus))
+                              for node, cpus in self.nodes.items()),
+                'cores': [format_cpulist(core) for core in self.cores],
+                'nics': self.nics,
+                'sriov': self.sriov,
+                'memory': None if self.memory is None else
+                          dict((str(node), size)
+                               for node, size in self.memory.items()),
+                'gigantic': self.gigantic,
+                'drivers': self.drivers,
+                'channels': self.channels}
+
+    def sensor_nodes(self, sensor_interfaces):
+        """Return the known NUMA nodes of some NICs."""
+        nodes = set(self.nic_node(name) for name in sensor_interfaces)
+        return sorted(node for node in nodes if node in self.nodes)
+
+    def nic_node(self, name):
+        """Return the NUMA node of a NIC, or None if it is unknown."""
+        node = self.nics.get(name)
+        if node is None and name in self.nics and len(self.nodes) == 1:
+            # Single node systems report -1
+            node = list(self.nodes)[0]
+        return node
+
+
+def plan_cores(layout, sensor_interfaces, housekeeping=HOUSEKEEPING_CORES):
+    """Return the CorePlan for sensors on some NICs, or None.
+
+    On every NUMA node with a sensor NIC, the first free physical core
+    handles interrupts and the other ones are isolated for the sensors.
+    The other nodes do the housekeeping; when every node has a sensor NIC,
+    the first ``housekeeping`` cores of each are kept for it. CPU 0 is
+    never isolated. A node without at least one core for the sensors is
+    left alone, so small VMs get no plan.
+    """
+    sensor_nodes = layout.sensor_nodes(sensor_interfaces)
+    if not sensor_nodes:
+        return None
+    shared = len(sensor_nodes) == len(layout.nodes)
+    isolated, irq = [], []
+    for node in sensor_nodes:
+        cpus = set(layout.nodes[node])
+        cores = [core for core in layout.cores if set(core) <= cpus]
+        if shared or any(0 in core for core in cores):
+            cores = [core for core in cores[housekeeping:] if 0 not in core]
+        if len(cores) < 2:
+            continue
+        irq.extend(cores[0])
+        for core in cores[1:]:
+            isolated.extend(core)
+    if not isolated:
+        return None
+    reserved = set(isolated + irq)
+    return CorePlan(sorted(isolated), sorted(irq),
+                    sorted(cpu for cpus in layout.nodes.values()
+                           for cpu in cpus if cpu not in reserved))
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(
+        description='Print the CPU layout of this node and its tuning.')
+    parser.add_argument('-s', '--sensor', action='append', default=[],
+                        metavar='INTERFACE',
+                        help='sensor interface (default: the SR-IOV ports)')
+    parser.add_argument('--sensor-memory', type=int, default=None,
+                        metavar='MIB',
+                        help='DPDK memory per sensor NUMA node '
+                             '(default: a quarter of the NUMA node)')
+    parser.add_argument('--sysfs', default=hardware.SYSFS_ROOT,
+                        help='sysfs mount point (default: %(default)s)')
+    parser.add_argument('--meminfo', default=PROC_MEMINFO,
+                        help='memory of systems without NUMA '
+                             '(default: %(default)s)')
+    parser.add_argument('--cores', action='store_true',
+                        help='only print the kernel arguments isolating '
+                             'the sensor cores (nothing if there are none)')
+    args = parser.parse_args(argv)
+
+    if args.cores:
+        # Run in the minion %pre with only this module, hardware and writer
+        layout = Topology.from_sysfs(args.sysfs, args.meminfo, False)
+        plan = plan_cores(layout, args.sensor or layout.sriov)
+        print(' '.join(plan.kernel_args()) if plan is not None else '')
+        return 0
+
+    # nictuning and tuning import this module
+    import nictuning
+    import tuning
+    # ethtool only knows the NICs of the running system
+    layout = Topology.from_sysfs(args.sysfs, args.meminfo,
+                                 args.sysfs == hardware.SYSFS_ROOT)
+    record = {'topology': layout.to_record()}
+    if args.sensor:
+        record['sensor_interfaces'] = ','.join(args.sensor)
+    if args.sensor_memory is not None:
+        record['sensor_memory'] = args.sensor_memory
+    json.dump(record, sys.stdout, indent=2, sort_keys=True)
+    print()
+    plan = tuning.Tuning.for_layout(layout, 'minion', args.sensor,
+                                    args.sensor_memory)
+    if plan.cores is None:
+        print('No cores to isolate', file=sys.stderr)
+    print(plan.kernel_args, file=sys.stderr)
+    if plan.nics:
+        print(nictuning.describe(plan.nics), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+"""Kernel command line tuning of a node, rendered into its kickstart."""
+import hardware
+import hugepages
+import nictuning
+import topology
+
+# Hugepages of nodes whose memory is unknown
+DEFAULT_HUGEPAGES = 'default_hugepagesz=2M hugepagesz=2M hugepages=2048'
+
+
+class Tuning(object):
+    """The kernel arguments a node is installed with.
+
+    Nodes without a known CPU layout get no isolated cores and the default
+    hugepages.
+    """
+
+    def __init__(self, cores=None, pages=None, nics=()):
+        """Init.
+
+        cores: topology.CorePlan of the sensor cores, or None
+        pages: hugepages.HugepagePlan, or None
+        nics: nictuning.NicPlan of each physical NIC
+        """
+        self.cores = cores
+        self.hugepages = pages
+        self.nics = list(nics)
+
+    @classmethod
+    def for_layout(cls, layout, role='minion', sensor_interfaces=(),
+                   sensor_memory=None):
+        """Plan the tuning of a node from its topology.Topology.
+
+        sensor_interfaces: defaults to the SR-IOV capable ports of minions;
+            masters only run sensors on interfaces given explicitly
+        sensor_memory: DPDK memory per sensor NUMA node in MiB
+        """
+        sensors = list(sensor_interfaces)
+        if not sensors and role != 'master':
+            sensors = layout.sriov
+        cores = topology.plan_cores(layout, sensors)
+        return cls(cores=cores,
+                   pages=hugepages.plan_hugepages(
+                       layout.memory, layout.sensor_nodes(sensors),
+                       sensor_memory, layout.gigantic),
+                   nics=nictuning.plan_nics(layout, cores, sensors))
+
+    @classmethod
+    def plan(cls, layout=None, sensor_interfaces=(), role='minion',
+             sensor_memory=None):
+        """Plan the tuning of a node from its ``topology`` record."""
+        if not layout:
+            return cls()
+        return cls.for_layout(topology.Topology.from_record(layout), role,
+                              sensor_interfaces, sensor_memory)
+
+    @classmethod
+    def local(cls, role='master', sysfs_root=hardware.SYSFS_ROOT):
+        """Plan the tuning of the machine this runs on."""
+        return cls.for_layout(topology.Topology.from_sysfs(sysfs_root), role)
+
+    @property
+    def kernel_args(self):
+        """Return the kernel arguments as one string."""
+        return ' '.join(args for args in (self.core_args, self.hugepage_args)
+                        if args)
+
+    @property
+    def core_args(self):
+        """Return the kernel arguments isolating the cores, or ''."""
+        if self.cores is None:
+            return ''
+        return ' '.join(self.cores.kernel_args())
+
+    @property
+    def hugepage_args(self):
+        """Return the kernel arguments reserving the hugepages.
+
+        Without a plan these are the defaults; the minion kickstart sizes
+        them from the node's memory instead.
+        """
+        if self.hugepages is None:
+            return DEFAULT_HUGEPAGES
+        return ' '.join(self.hugepages.kernel_args())
+
+    @property
+    def hugepage_nodes(self):
+        """Return the (sysfs file, count) pairs setting uneven hugepages."""
+        if self.hugepages is None:
+            return []
+        return self.hugepages.node_pages()
+
+    @property
+    def nic_script(self):
+        """Return the boot script tuning the NICs, empty without NICs."""
+        if not self.nics:
+            return ''
+        banned = []
+        if self.cores is not None:
+            banned = self.cores.isolated + self.cores.irq
+        return nictuning.boot_script(self.nics, banned)
+
+    @property
+    def nic_unit(self):
+        """Return the systemd unit running nic_script."""
+        return nictuning.boot_unit()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+"""Atomic, checksummed file output."""
+import hashlib
+import io
+import os
+import tempfile
+
+MANIFEST = 'SHA256SUMS'
+BUFFER_SIZE = 64 * 1024
+
+
+def file_digest(path):
+    """Return the hex SHA-256 digest of a file, or None if it is unreadable."""
+    sha256 = hashlib.sha256()
+    try:
+        with io.open(path, 'rb') as source:
+            for block in iter(lambda: source.read(BUFFER_SIZE), b''):
+                sha256.update(block)
+    except (IOError, OSError):
+        return None
+    return sha256.hexdigest()
+
+
+class AtomicFile(object):
+    """A file written to a temporary name and renamed by its OutputWriter.
+
+    Data written is hashed on the way; use as a context manager or call
+    close().
+    """
+
+    def __init__(self, writer, name, checksum=True, mode=0o644):
+        """Init."""
+        self.writer = writer
+        self.name = name
+        self.checksum = checksum
+        self.path = os.path.join(writer.directory, name)
+        directory = os.path.dirname(self.path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        fd, self.temp = tempfile.mkstemp(
+            dir=directory, prefix='.' + os.path.basename(name) + '.')
+        os.chmod(self.temp, mode)
+        self.file = io.open(fd, 'wb', buffering=BUFFER_SIZE)
+        self.sha256 = hashlib.sha256()
+        self.digest = None
+
+    def write(self, data):
+        """Write text or bytes."""
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+        self.sha256.update(data)
+        self.file.write(data)
+
+    def writelines(self, lines):
+        """Write an iterable of text or bytes."""
+        for line in lines:
+            self.write(line)
+
+    def close(self):
+        """Finish the file and hand it to the writer."""
+        if self.digest is not None:
+            return
+        self.digest = self.sha256.hexdigest()
+        self.file.flush()
+        self.writer.finished(self)
+
+    def discard(self):
+        """Drop the temporary file."""
+        if not self.file.closed:
+            self.file.close()
+        if os.path.exists(self.temp):
+            os.remove(self.temp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class OutputWriter(object):
+    """Write files under a directory with write-to-temp plus rename.
+
+    Finished files are kept pending until commit(), which fsyncs their data,
+    renames them into place and then fsyncs each touched directory once.
+    A manifest of SHA-256 digests (``sha256sum -c`` format) is kept in the
+    directory; files whose digest matches the manifest, and that still
+    have that digest on disk, are not rewritten.
+    """
+
+    def __init__(self, directory, fsync=True):
+        """Init."""
+        self.directory = directory
+        self.fsync = fsync
+        self.pending = []
+        self.manifest = {}
+        self.manifest_changed = False
+        self.checked = {}
+        try:
+            with open(os.path.join(directory, MANIFEST)) as manifest:
+                for line in manifest:
+                    digest, name = line.rstrip('\n').split('  ', 1)
+                    self.manifest[name] = digest
+        except (IOError, OSError, ValueError):
+            pass
+
+    def open(self, name, checksum=True, mode=0o644):
+        """Return an AtomicFile for name, relative to the directory.
+
+        Files opened with checksum=False are always replaced and are left
+        out of the manifest.
+        """
+        return AtomicFile(self, name, checksum, mode)
+
+    def digest(self, name):
+        """Return the manifest digest of name, or None."""
+        return self.manifest.get(name)
+
+    def intact(self, name):
+        """Return True if name is on disk with its manifest digest.
+
+        Catches files edited or corrupted since they were written.
+        """
+        if name not in self.checked:
+            digest = self.manifest.get(name)
+            self.checked[name] = digest is not None and file_digest(
+                os.path.join(self.directory, name)) == digest
+        return self.checked[name]
+
+    def finished(self, atomic):
+        """Queue a closed AtomicFile, or drop it if nothing changed."""
+        if atomic.checksum:
+            if (self.manifest.get(atomic.name) == atomic.digest and
+                    self.intact(atomic.name)):
+                atomic.discard()
+                return
+            self.manifest[atomic.name] = atomic.digest
+            self.manifest_changed = True
+            self.checked.pop(atomic.name, None)
+        self.pending.append(atomic)
+
+    def _write_manifest(self):
+        """Queue the manifest itself."""
+        atomic = AtomicFile(self, MANIFEST, checksum=False)
+        for name in sorted(self.manifest):
+            atomic.write(self.manifest[name] + '  ' + name + '\n')
+        atomic.digest = atomic.sha256.hexdigest()
+        atomic.file.flush()
+        self.pending.append(atomic)
+
+    def commit(self):
+        """Move every pending file into place.
+
+        Return: number of checksummed files written
+        """
+        written = len([atomic for atomic in self.pending if atomic.checksum])
+        if self.manifest_changed:
+            self._write_manifest()
+            self.manifest_changed = False
+        directories = set()
+        for atomic in self.pending:
+            if self.fsync:
+                os.fsync(atomic.file.fileno())
+            atomic.file.close()
+        for atomic in self.pending:
+            os.rename(atomic.temp, atomic.path)
+            directories.add(os.path.dirname(atomic.path))
+        if self.fsync:
+            for directory in directories:
+                fd = os.open(directory, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+        self.pending = []
+        return written
+
+    def abort(self):
+        """Drop every pending file."""
+        for atomic in self.pending:
+            atomic.discard()
+        self.pending = []